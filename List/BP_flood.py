@@ -0,0 +1,341 @@
+import os
+import numpy as np
+from BP_infer import free_energy_edges
+from affinity import affinity_product, log_clipped
+from list_to_csr import list_to_csr
+from operator_cache import OperatorCache
+
+
+def BP_Inference_flood(q, n, c, adj_list, criterium, t_max, damping = 0.5, init_messages = None, return_state = False, c_structure = None, dtype = float, log_domain = False, storage = None, checkpoint = 1):
+	"""
+	Runs the belief propagation algorithm with a flooding schedule: on each step all messages are updated at once from
+	the messages of the previous step, using array operations over the graph's CSR edge arrays. The new messages are
+	mixed with the old ones (a fraction damping of the old message is kept) to prevent oscillations.
+	Takes the same arguments (damping coming right after t_max) and returns the same values as BP_Inference. For very
+	large graphs, the messages can be stored with a lower precision dtype, in the log domain, and in files of the
+	directory storage (see BP_flood_batch).
+	"""
+	# A batch with a single initialization
+	if init_messages is not None:
+		init_messages = init_messages[None]
+	result = BP_flood_batch(q, n, c, list_to_csr(adj_list), criterium, t_max, 1, damping, init_messages, return_state, c_structure, dtype = dtype, log_domain = log_domain, storage = storage, checkpoint = checkpoint)
+	return tuple(value[0] for value in result)
+
+
+def BP_Inference_batch(q, n, c, adj_list, criterium, t_max, nb_restarts = 3, damping = 0.5, c_structure = None):
+	"""
+	Runs nb_restarts independent random initializations of the flooding belief propagation algorithm together, and
+	returns the values of BP_Inference for the one with the lowest free energy, along with the free energy of every
+	restart
+	"""
+	est_prop, est_edges, groups, f_BP = BP_flood_batch(q, n, c, list_to_csr(adj_list), criterium, t_max, nb_restarts, damping, c_structure = c_structure)
+	# The restart with the lowest free energy
+	best = np.argmin(f_BP)
+	return est_prop[best], est_edges[best], groups[best], f_BP[best], f_BP
+
+
+def BP_flood_batch(q, n, c, csr, criterium, t_max, nb_restarts, damping = 0.5, init_messages = None, return_state = False, c_structure = None, log_fixed = None, field_fixed = None, nb_fixed = 0, dtype = float, log_domain = False, storage = None, checkpoint = 1, chunk_size = None, init_field = None, fringe = None):
+	"""
+	Runs nb_restarts independent random initializations of the flooding belief propagation algorithm on a graph given
+	by its CSR arrays csr = (indptr, indices, reverse), with all messages stored in a single (nb_restarts, M, q) array.
+	A restart whose messages have converged is no longer updated, so that each restart gives the result of its own run.
+	The parameters n and c can be shared by all restarts (shapes (q,) and (q, q)) or given for each restart (shapes
+	(nb_restarts, q) and (nb_restarts, q, q)).
+	Returns the arrays of the estimated group proportions, edge matrices, group assignments and free energies of
+	every restart. As in BP_Inference, the messages can start from init_messages, and the final messages and "external
+	fields" are returned as well if return_state is True. The products by c are computed according to its structure
+	c_structure (see affinity_product), detected if None.
+	The graph can also be part of a bigger graph whose other nb_fixed nodes have fixed messages: log_fixed then holds, for
+	each node of the graph, the sum of the logs of c times the fixed messages it receives, and field_fixed holds the
+	contribution of the other nodes' marginal probabilities to the "external field" (the sum of c times them).
+	If the messages of the other nodes are updated along with the graph's instead (e.g. trees hanging from it), fringe is
+	a function of the "external field" h and of the sums of the logs of c times the messages each node of the graph
+	receives from the graph, called on every step once the graph's messages are updated, which updates the other messages
+	and returns log_fixed, field_fixed and the sum of the differences of the new to the old other messages of each
+	restart. It is first called with a third argument True to initialize the other messages, and then only returns
+	log_fixed and field_fixed.
+	The "external field" starts from init_field (e.g. the field of a previous run) if given, and otherwise from the field
+	of the marginal probabilities given by the initial messages.
+	For very large graphs:
+		dtype sets the precision of the messages and of the arrays of the size of the graph (e.g. np.float32)
+		log_domain stores the logs of the messages instead, which keeps the precision of the very small probabilities
+		storage is a directory where the messages and marginal probabilities are kept as memory-mapped .npy files,
+		and where the "external field" and number of steps are saved every checkpoint steps. If the directory holds
+		the state of an interrupted run on the same graph with the same parameters, the run is resumed from it (t_max
+		counting the steps already taken); the state of a finished run is never resumed. The returned messages are then
+		the memory-mapped array (holding the logs of the messages if log_domain is True). The scratch files tails.npy
+		and log_in.npy, which are made again by every run, are removed once it finishes, leaving messages.npy,
+		marginals.npy and state.npz
+		chunk_size is the number of edges whose messages are updated at once (about 2^20 with storage and all of them
+		otherwise if None), so that only the arrays of the size of the nodes are fully held in memory
+	"""
+	# CSR arrays of the graph and the code of each edge's reverse
+	indptr, indices, reverse = csr
+	# Number of nodes on the graph
+	N = len(indptr) - 1
+	# The number of directed edges
+	M = len(indices)
+	# The ranges of nodes whose edges are updated together
+	if chunk_size is None and storage is not None:
+		chunk_size = 2**20
+	chunks = __chunks(indptr, chunk_size)
+
+	# The group parameters of each restart
+	n = np.broadcast_to(n, (nb_restarts, q))
+	c = np.broadcast_to(c, (nb_restarts, q, q))
+
+	dtype = np.dtype(dtype)
+	# The function computing c times messages
+	c_dot = affinity_product(c, c_structure, dtype = dtype)
+
+	# A stored state is only resumed if it comes from an unfinished run on the same graph with the same parameters
+	key = None if storage is None else OperatorCache.key(indptr, indices, reverse, n, c, np.array(damping), np.array(str(c_structure)), np.array(log_domain), np.empty(0, dtype = dtype))
+	resume = storage is not None and __resumable(storage, key)
+	# The arrays of messages and marginal probabilities, in memory or in files of the storage directory, and the
+	# (0-indexed) tail of each directed edge
+	messages = __array(storage, 'messages', (nb_restarts, M, q), dtype, resume)
+	marg_prob = __array(storage, 'marginals', (nb_restarts, N, q), dtype, resume)
+	tails = __array(storage, 'tails', (M,), np.dtype(np.int64), False)
+	# For each edge (u, v), the log of c times the message from v to u
+	log_in = __array(storage, 'log_in', (nb_restarts, M, q), dtype, False)
+
+	# Number of steps taken by the algorithm
+	t = 0
+	# Measures the convergence of the messages of each restart
+	conv = np.full(nb_restarts, criterium + 1, dtype = float)
+	if resume:
+		# The state saved by the interrupted run
+		state = np.load(os.path.join(storage, 'state.npz'))
+		h, t = np.array(state['h']), int(state['t'])
+		if 'conv' in state.files:
+			conv = np.array(state['conv'])
+	for first, last in chunks:
+		start, end = indptr[first], indptr[last]
+		tails[start : end] = np.repeat(np.arange(first, last), np.diff(indptr[first : last + 1]))
+		if resume:
+			continue
+		# For each directed edge of each restart we associate a "message" array of size q, with norm 1
+		if init_messages is None:
+			chunk_messages = np.random.rand(nb_restarts, end - start, q)
+			chunk_messages /= np.sum(chunk_messages, axis = 2, keepdims = True)
+		else:
+			chunk_messages = init_messages[:, start : end]
+		messages[:, start : end] = log_clipped(chunk_messages) if log_domain else chunk_messages
+
+	# The fixed messages and marginal probabilities of the nodes outside the graph
+	if log_fixed is None:
+		log_fixed = 0
+	if field_fixed is None:
+		field_fixed = np.zeros(q)
+	field_fixed = np.broadcast_to(field_fixed, (nb_restarts, q))
+
+	# For each node, the sum of log_in over its neighbors
+	log_prod = __incoming(c_dot, messages, log_in, indptr, reverse, chunks, log_domain)
+	if fringe is not None:
+		# The messages of the other nodes are first given by the field h is started from
+		if not resume:
+			h = np.zeros((nb_restarts, q)) if init_field is None else np.broadcast_to(init_field, (nb_restarts, q))
+		log_fixed, field_fixed = fringe(h, log_prod, True)
+	log_prod += log_fixed
+	# The marginal probability of each node belonging to each group and the initial "external field" h
+	if not resume and init_field is None:
+		marg_prob[:] = __marginals(n, log_prod, np.zeros((nb_restarts, q)))
+		h = (__field(c, marg_prob) + field_fixed)/(N + nb_fixed)
+	elif not resume:
+		h = np.array(np.broadcast_to(init_field, (nb_restarts, q)), dtype = float)
+		marg_prob[:] = __marginals(n, log_prod, h)
+
+	while np.any(conv > criterium) and t < t_max:
+		t += 1
+
+		# Only the restarts which have not converged are updated (all of them through a view while none has)
+		active = conv > criterium
+		rows = slice(None) if np.all(active) else active
+
+		# Sum of the differences of the new to the old messages
+		conv[active] = 0
+		log_field = (log_clipped(n[rows]) - h[rows]).astype(dtype)[:, None]
+		for first, last in chunks:
+			start, end = indptr[first], indptr[last]
+			old_messages = messages[rows, start : end]
+
+			# The new message (u, v) is the product over u's neighbors except v, obtained by removing (v, u) from the sum
+			# of logs
+			log_messages = log_field + np.take(log_prod[rows], tails[start : end], axis = 1) - log_in[rows, start : end]
+			if log_domain:
+				new_messages = __log_normalize(log_messages)
+				if damping > 0:
+					new_messages = np.logaddexp(new_messages + dtype.type(np.log(1 - damping)), old_messages + dtype.type(np.log(damping)))
+				conv[active] += np.sum(np.fabs(np.exp(new_messages) - np.exp(old_messages)), axis = (1, 2), dtype = float)
+			else:
+				new_messages = __normalize(log_messages)
+				new_messages *= 1 - damping
+				new_messages += damping*old_messages
+				conv[active] += np.sum(np.fabs(new_messages - old_messages), axis = (1, 2), dtype = float)
+			del log_messages
+			messages[rows, start : end] = new_messages
+			del new_messages
+
+		# Updating the marginal probabilities and the external field h, which must be damped as well since all nodes
+		# react to it at once
+		log_prod = __incoming(c_dot, messages, log_in, indptr, reverse, chunks, log_domain)
+		if fringe is not None:
+			log_fixed, field_fixed, fringe_conv = fringe(h, log_prod)
+			conv[active] += fringe_conv[active]
+		log_prod += log_fixed
+		marg_prob[rows] = __marginals(n[rows], log_prod[rows], h[rows])
+		h[rows] = damping*h[rows] + (1 - damping)*(__field(c[rows], marg_prob[rows]) + field_fixed[rows])/(N + nb_fixed)
+
+		# Saving the state of the run
+		if storage is not None and t % checkpoint == 0:
+			__save(storage, messages, marg_prob, h, t, conv, key)
+	# The final state is marked as finished, so that it is not resumed by the next run
+	if storage is not None:
+		__save(storage, messages, marg_prob, h, t, conv, key, True)
+	del log_in
+	__remove(storage, 'log_in')
+
+	# The estimated proportion of nodes on each group
+	est_prop = np.sum(marg_prob, axis = 1, dtype = float)/N
+
+	# The belief propagation estimate for the free energy and the estimated edge matrix
+	f_BP, est_edges = free_energy_edges(N, est_prop, c, h, messages, tails, reverse, c_structure, log_domain, chunk_size)
+	del tails
+	__remove(storage, 'tails')
+
+	# An array containing the most probable group for each node
+	groups = np.argmax(marg_prob, axis = 2) + 1
+
+	if return_state:
+		if log_domain and storage is None:
+			messages = np.exp(messages)
+		return est_prop, est_edges, groups, f_BP, messages, h
+	return est_prop, est_edges, groups, f_BP
+
+
+def __chunks(indptr, chunk_size):
+	"""
+	Returns the (first, last + 1) nodes of consecutive ranges of nodes having about chunk_size edges each (a single range
+	of all nodes if chunk_size is None), so that the edges of a range are the contiguous codes indptr[first] to
+	indptr[last] - 1
+	"""
+	N = len(indptr) - 1
+	if chunk_size is None:
+		return [(0, N)]
+	bounds = np.unique(np.concatenate(([0], np.searchsorted(indptr, np.arange(chunk_size, indptr[-1], chunk_size)), [N])))
+	return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def __incoming(c_dot, messages, log_in, indptr, reverse, chunks, log_domain = False):
+	"""
+	Fills log_in with the log of c times the message (v, u) for each directed edge (u, v), and returns for each node
+	the sum of these logs over all of its neighbors
+	"""
+	# log(c.m) for every message m, written at the reverse edge (clipped, so that the factors given by zero entries of c
+	# can be removed)
+	for first, last in chunks:
+		start, end = indptr[first], indptr[last]
+		chunk_messages = messages[:, start : end]
+		log_in[:, reverse[start : end]] = log_clipped(c_dot(np.exp(chunk_messages) if log_domain else chunk_messages, True))
+
+	# Sum over each CSR segment (nodes without neighbors have an empty sum)
+	log_prod = np.zeros((messages.shape[0], len(indptr) - 1, messages.shape[2]), dtype = log_in.dtype)
+	for first, last in chunks:
+		segments = indptr[first : last]
+		nonempty = segments < indptr[first + 1 : last + 1]
+		if np.any(nonempty):
+			log_prod[:, first : last][:, nonempty] = np.add.reduceat(log_in[:, indptr[first] : indptr[last]], segments[nonempty] - indptr[first], axis = 1)
+
+	return log_prod
+
+
+def __marginals(n, log_prod, h):
+	"""
+	Returns the marginal probability of each node belonging to each group
+	"""
+	return __normalize((log_clipped(n) - h).astype(log_prod.dtype)[:, None] + log_prod)
+
+
+def __field(c, marg_prob):
+	"""
+	Returns the sum of c times the marginal probabilities of all nodes, which divided by the number of nodes is the
+	"external field" h
+	"""
+	return np.einsum('rab,rb->ra', c, np.sum(marg_prob, axis = 1, dtype = float))
+
+
+def __normalize(log_values):
+	"""
+	Exponentiates the last axis of log_values and normalizes it to have sum 1
+	"""
+	values = np.exp(log_values - __max_groups(log_values)[..., None])
+	values /= np.dot(values, np.ones(values.shape[-1]))[..., None]
+	return values
+
+
+def __log_normalize(log_values):
+	"""
+	Subtracts from the last axis of log_values the log of the sum of its exponentials, so that they have sum 1
+	"""
+	max_values = __max_groups(log_values)[..., None]
+	sums = np.dot(np.exp(log_values - max_values), np.ones(log_values.shape[-1], dtype = log_values.dtype))[..., None]
+	return log_values - max_values - np.log(sums)
+
+
+def __array(storage, name, shape, dtype, resume):
+	"""
+	Returns an array of the given shape, in memory if storage is None and memory-mapped to the file name.npy of the
+	directory storage otherwise (keeping the values in the file if resume is True)
+	"""
+	if storage is None:
+		return np.empty(shape, dtype = dtype)
+	os.makedirs(storage, exist_ok = True)
+	array = np.lib.format.open_memmap(os.path.join(storage, name + '.npy'), mode = 'r+' if resume else 'w+', dtype = dtype, shape = None if resume else shape)
+	if array.shape != shape or array.dtype != dtype:
+		raise Exception("The stored " + name + " do not match the graph!")
+	return array
+
+
+def __remove(storage, name):
+	"""
+	Removes the file name.npy of the directory storage, made by __array, once its array is no longer used
+	"""
+	if storage is not None:
+		os.remove(os.path.join(storage, name + '.npy'))
+
+
+def __resumable(storage, key):
+	"""
+	Returns whether the directory storage holds the state of an unfinished run whose graph and parameters have the hash
+	key
+	"""
+	path = os.path.join(storage, 'state.npz')
+	if not os.path.exists(path):
+		return False
+	state = np.load(path)
+	return 'key' in state.files and str(state['key']) == key and not bool(state['done'])
+
+
+def __save(storage, messages, marg_prob, h, t, conv, key, done = False):
+	"""
+	Writes the arrays of messages and marginal probabilities to their files and saves the "external field", number of
+	steps taken, convergence of each restart, hash of the run's graph and parameters and whether the run is finished, replacing the previous state
+	only once it is complete
+	"""
+	messages.flush()
+	marg_prob.flush()
+	np.savez(os.path.join(storage, 'state.tmp.npz'), h = h, t = t, conv = conv, key = key, done = done)
+	os.replace(os.path.join(storage, 'state.tmp.npz'), os.path.join(storage, 'state.npz'))
+
+
+def __max_groups(values):
+	"""
+	Returns the maximum over the last axis of values. For a few groups, taking the maximum group by group is much faster
+	than a reduction over such a short axis
+	"""
+	if values.shape[-1] > 8:
+		return np.max(values, axis = -1)
+	max_values = np.copy(values[..., 0])
+	for k in range(1, values.shape[-1]):
+		np.maximum(max_values, values[..., k], out = max_values)
+	return max_values
@@ -1,12 +1,18 @@
 import numpy as np
+from affinity import affinity_product, log_clipped
 
 
-def BP_Inference(q, n, c, adj_list, criterium, t_max):
+def BP_Inference(q, n, c, adj_list, criterium, t_max, init_messages = None, return_state = False, c_structure = None):
 	"""
 	Runs the belief propagation algorithm on a graph given by its adjacency list adj_list and (assumed) oracle parameters
 	q (number of groups), n (proportion of nodes in each group) and c (probability of a pair of nodes from given groups to
 	be joined by an edge multiplied by the number of nodes). Returns the infered group assignment and its free energy.
+	The messages start from init_messages (of shape (M, q), e.g. the messages of a previous run) if given, or at random.
+	If return_state is True, the final messages and "external field" h are returned as well.
+	The products by c are computed according to its structure c_structure (see affinity_product), detected if None.
 	"""
+	# The function computing c times messages
+	c_dot = affinity_product(c, c_structure)
 	# Number of nodes on the graph
 	N = len(adj_list.keys())
 	# The number of directed edges
@@ -17,7 +23,7 @@ def BP_Inference(q, n, c, adj_list, criterium, t_max):
 	code_to_edge = []
 	
 	# For each directed edge we associate a "message" array of size q
-	messages = np.random.rand(M, q)
+	messages = np.random.rand(M, q) if init_messages is None else np.array(init_messages, dtype = float)
 
 	count = 0
 	# For each node of the graph
@@ -37,7 +43,7 @@ def BP_Inference(q, n, c, adj_list, criterium, t_max):
 		# Compute the marginal probability array of node u
 		p = marg_prob[u - 1]
 		for v in neighbors:
-			p += np.dot(c, messages[edge_to_code[(v, u)]])*messages[edge_to_code[(u, v)]]
+			p += c_dot(messages[edge_to_code[(v, u)]])*messages[edge_to_code[(u, v)]]
 		if len(neighbors) == 0:
 			np.copyto(p, np.ones(q))
 		p /= p.sum()
@@ -45,15 +51,21 @@ def BP_Inference(q, n, c, adj_list, criterium, t_max):
 	# Initialization of the "external field" h
 	h = np.zeros(q)
 	for k in range(N):
-		h += np.dot(c, marg_prob[k])
+		h += c_dot(marg_prob[k])
 	h /= N
 
+	# The (0-indexed) tail and the code of the reverse (v, u) of each directed edge (u, v)
+	tails = np.array([u - 1 for u, v in code_to_edge], dtype = np.int64)
+	reverse = np.array([edge_to_code[(v, u)] for u, v in code_to_edge], dtype = np.int64)
+	# The log of c times each message, and for each node u the log of the product of c times the messages (k, u) over all
+	# of u's neighbors k
+	log_cm, log_prod = __log_products(c_dot, messages, tails, reverse, N)
+
 	# Measures the convergence of the messages
 	conv = criterium + 1
 	# Number of steps taken by the algorithm
 	t = 0
 
-	prod = np.zeros(q)
 	old_message = np.zeros(q)
 	old_marg_prob = np.zeros(q)
 	while conv > criterium and t < t_max:
@@ -69,74 +81,159 @@ def BP_Inference(q, n, c, adj_list, criterium, t_max):
 			# The current message before changes are made
 			np.copyto(old_message, curr_message)
 			
-			# Updating current message
-			np.copyto(prod, np.ones(q))
-			for k in adj_list[u]:
-				if k != v:
-					prod *= np.dot(c, messages[edge_to_code[(k, u)]])
-			np.copyto(curr_message, n*np.exp(-h)*prod)
+			# Updating current message: the product over u's neighbors except v is the product over all of u's neighbors
+			# with the factor of message (v, u) removed
+			log_message = log_prod[u - 1] - log_cm[reverse[i]] - h
+			np.copyto(curr_message, n*np.exp(log_message - np.max(log_message)))
 			curr_message /= np.sum(curr_message)
 
 			# Adding to conv the difference of new to the old message code i
 			conv += np.linalg.norm(curr_message - old_message, 1)
 
+			# Updating the log of c times the current message and the product of node v
+			log_diff = log_clipped(c_dot(curr_message, True)) - log_cm[i]
+			log_cm[i] += log_diff
+			log_prod[v - 1] += log_diff
+
 			margv = marg_prob[v - 1]
 			# The marginal probability array of node v before changes are made
 			np.copyto(old_marg_prob, margv)
-			# Updating the marginal probability array of node v
-			margv *= np.dot(c, curr_message)/np.dot(c, old_message)
+			# Updating the marginal probability array of node v (the factors are scaled by their maximum, which the
+			# normalization removes, and kept above the smallest positive float so that they never all vanish)
+			margv *= np.exp(np.maximum(log_diff - np.max(log_diff), np.log(np.finfo(float).tiny)))
 			margv /= np.sum(margv)
 
 			# Updating the external field h
-			h += np.dot(c, margv - old_marg_prob)/N
+			h += c_dot(margv - old_marg_prob)/N
+
+		# The updates of the products accumulate rounding errors, so they are computed again after each sweep
+		log_cm, log_prod = __log_products(c_dot, messages, tails, reverse, N)
 
 	# The estimated proportion of nodes on each group
 	est_prop = np.sum(marg_prob, axis = 0)/N
 
 	# The belief propagation estimate for the free energy and the estimated edge matrix
-	f_BP, est_edges = free_energy(adj_list, N, q, est_prop, c, h, messages, edge_to_code)
+	f_BP, est_edges = free_energy_edges(N, est_prop, c, h, messages, tails, reverse, c_structure)
 
 	# An array containing the most probable group for each node
 	groups = np.argmax(marg_prob, axis = 1) + np.ones(N, dtype = np.int8)
 
+	if return_state:
+		return est_prop, est_edges, groups, f_BP, messages, h
 	return est_prop, est_edges, groups, f_BP
 
 
-def free_energy(adj_list, N, q, n, c, h, messages, edge_to_code):
+def __log_products(c_dot, messages, tails, reverse, N):
+	"""
+	Returns the log of c times each message, and for each node u the sum of these logs over the messages (v, u) it
+	receives
+	"""
+	log_cm = log_clipped(c_dot(messages, True))
+	log_in = log_cm[reverse]
+	log_prod = np.zeros((N, messages.shape[1]))
+	for a in range(messages.shape[1]):
+		log_prod[:, a] = np.bincount(tails, weights = log_in[:, a], minlength = N)
+	return log_cm, log_prod
+
+
+def free_energy(adj_list, N, q, n, c, h, messages, edge_to_code, c_structure = None):
 	"""
 	Calculates the free energy associated to the parameters given and estimates the edge matrix
 	"""
-	f_BP = 0
-	prod = n*np.exp(-h)
-	prod_u = np.zeros(q)
-	est_edges = np.zeros((q, q))
-	
+	# The tail and the code of the reverse of each directed edge
+	tails = np.zeros(len(edge_to_code), dtype = np.int64)
+	reverse = np.zeros(len(edge_to_code), dtype = np.int64)
+	for (u, v), code in edge_to_code.items():
+		tails[code] = u - 1
+		reverse[code] = edge_to_code[(v, u)]
+
+	return free_energy_edges(N, n, c, h, messages, tails, reverse, c_structure)
+
+
+def free_energy_edges(N, n, c, h, messages, tails, reverse, c_structure = None, log_domain = False, chunk_size = None):
+	"""
+	Calculates the free energy associated to the parameters given and estimates the edge matrix, for messages indexed by
+	the codes of the directed edges, given the (0-indexed) tail and the code of the reverse of each edge.
+	The messages of several runs can be scored at once: messages can have shape (R, M, q), and then n, h and c can be given
+	for each run (shapes (R, q) and (R, q, q)) and the free energies and edge matrices of all runs are returned.
+	If h is None, it is computed from the marginal probabilities given by the messages.
+	The products by c are computed according to its structure c_structure (see affinity_product), detected if None.
+	If log_domain is True, messages holds the logs of the messages. The edges are read by chunks of chunk_size codes (all
+	at once if None), so that messages can be a memory-mapped array bigger than the memory.
+	"""
+	batch = messages.ndim == 3
+	if not batch:
+		messages = messages[None]
+	R, M, q = messages.shape
+
+	# The group parameters of each run
+	n = np.broadcast_to(n, (R, q))
+	c = np.broadcast_to(c, (R, q, q))
+	c_dot = affinity_product(c, c_structure)
+
+	# The sum of log(Zuv) over all directed edges (u, v), the sum of outer(muv, mvu)/Zuv and, for each node u, the log
+	# of the product of c times the messages (v, u) over all of u's neighbors v
+	log_Z = np.zeros(R)
+	est_edges = np.zeros((R, q, q))
+	log_prod = np.zeros((R, N, q))
+	step = max(M, 1) if chunk_size is None else chunk_size
+	for start in range(0, M, step):
+		end = min(start + step, M)
+		# The messages (u, v) and (v, u) of the chunk's directed edges (u, v)
+		out_messages = __probabilities(messages[:, start : end], log_domain)
+		in_messages = __probabilities(np.take(messages, reverse[start : end], axis = 1), log_domain)
+
+		# For each directed edge (u, v), c times the message (v, u) (which may not have norm 1, so the planted product
+		# computes its sum)
+		cm = c_dot(in_messages)
+		# Zuv for every directed edge (u, v) (clipped, as the zero entries of c give a zero Zuv to the messages of a group
+		# whose proportion has vanished)
+		Z = np.maximum(np.sum(out_messages*cm, axis = 2), np.finfo(float).tiny)
+		log_Z += np.sum(np.log(Z), axis = 1)
+		est_edges += np.matmul(np.swapaxes(out_messages/Z[:, :, None], 1, 2), in_messages)
+
+		# The chunk's tails span a range of nodes (a short one, as edges are usually sorted by tail)
+		chunk_tails = tails[start : end]
+		low = np.min(chunk_tails)
+		log_cm = log_clipped(cm)
+		for r in range(R):
+			for a in range(q):
+				log_prod[r, low : np.max(chunk_tails) + 1, a] += np.bincount(chunk_tails - low, weights = log_cm[r, :, a])
+
+	if h is None:
+		# The "external field" created by the marginal probabilities of all nodes
+		marg_prob = np.exp(log_prod - np.max(log_prod, axis = 2, keepdims = True))*n[:, None]
+		marg_prob /= np.sum(marg_prob, axis = 2, keepdims = True)
+		h = np.einsum('rab,rb->ra', c, np.sum(marg_prob, axis = 1))/N
+	h = np.broadcast_to(h, (R, q))
+
+	# The log of the sum over the groups of n*exp(-h) times the product above, for each node
+	log_field = log_clipped(n)[:, None] - h[:, None] + log_prod
+	max_field = np.max(log_field, axis = 2)
+	log_sum = max_field + np.log(np.sum(np.exp(log_field - max_field[:, :, None]), axis = 2))
+
 	# Only application of formulas from statistical physics
-	for u in adj_list.keys():
-		np.copyto(prod_u, prod)
-		for v in adj_list[u]:
-			muv = messages[edge_to_code[(u, v)]]
-			mvu = messages[edge_to_code[(v, u)]]
-
-			# All needed to compute the free energy
-			cmvu = np.dot(c, mvu)
-			prod_u *= cmvu
-			Zuv = np.dot(muv, cmvu)
-			# Needed to update the estimated edge matrix
-			est_edges += np.outer(muv, mvu)/Zuv
-
-			f_BP += np.log(Zuv)
-		f_BP -= 2*np.log(np.sum(prod_u))
-	f_BP /= (2*N)
-
-	nn = np.outer(n, n)
+	f_BP = (log_Z - 2*np.sum(log_sum, axis = 1))/(2*N)
+
+	# The estimated edge matrix is the sum of outer(muv, mvu)/Zuv over all directed edges
 	est_edges *= c/N
 	# Average (directed) degree
-	c_avg = np.sum(est_edges)
-	# The estimated edge matrix
-	est_edges /= nn
+	c_avg = np.sum(est_edges, axis = (1, 2))
+	# The estimated edge matrix (a group whose proportion has vanished, below the precision of the proportions, holds no
+	# node and has no edges)
+	present = n > np.finfo(float).eps
+	est_edges = np.divide(est_edges, n[:, :, None]*n[:, None, :], out = np.zeros_like(est_edges), where = present[:, :, None] & present[:, None, :])
 
 	# Final value of the Bethe free energy
 	f_BP -= c_avg/2
 
-	return f_BP, est_edges
+	if batch:
+		return f_BP, est_edges
+	return f_BP[0], est_edges[0]
+
+
+def __probabilities(messages, log_domain):
+	"""
+	Returns the messages as an array of probabilities in double precision, exponentiating them if they are logs
+	"""
+	return np.exp(messages, dtype = float) if log_domain else np.asarray(messages, dtype = float)
@@ -1,19 +1,23 @@
 import numpy as np
 from BP_infer import BP_Inference
+from BP_flood import BP_flood_batch
+from list_to_csr import list_to_csr
 
 
-def BP_learning(q, n_init, c_init, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn):
+def BP_learning(q, n_init, c_init, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn, inference = BP_Inference):
 	"""
 	Given a graph by its adjacency list and a number of groups to distribute its edges, along with initial assumptions of the
 	group parameters, runs the belief propagation algorithm to learn the true parameters and returns the most probable group
 	assignment and its free energy
+	The inference step is done by the function inference, which must take (init_messages and return_state by keyword)
+	and return the same values as BP_Inference.
+	Each step starts from the messages of the previous one, so that only the first step starts from random messages.
 	"""
-	# Number of nodes on the graph
-	N = len(adj_list.keys())
-
 	# Initial values of arrays n and c
 	n = n_init
 	c = c_init
+	# The messages of the previous step
+	messages = None
 
 	conv = crit_learn + 1
 	t = 0
@@ -24,10 +28,61 @@ def BP_learning(q, n_init, c_init, adj_list, crit_infer, crit_learn, tmax_infer,
 		n_old = np.copy(n)
 		c_old = np.copy(c)
 
-		# Most probable group of each node and the free energy of this configuration
-		n, c, groups, f_BP = BP_Inference(q, n, c, adj_list, crit_infer, tmax_infer)
+		# Most probable group of each node and the free energy of this configuration. The "external field" is not passed
+		# on to the next step: it is c times the marginal probabilities, so the inference recomputes it from the messages
+		# with the new parameters
+		n, c, groups, f_BP, messages, _ = inference(q, n, c, adj_list, crit_infer, tmax_infer, init_messages = messages, return_state = True)
 		
 		# Updating the convergence measure
 		conv = np.sum(np.fabs(n - n_old)) + np.sum(np.fabs(c - c_old))
 	# Returns the estimated assignment of the nodes and its Bethe free energy
 	return groups, f_BP
+
+
+def BP_learning_batch(q, n_init, c_init, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn, damping = 0.5):
+	"""
+	Runs the BP_learning algorithm for several initial assumptions of the group parameters at once, given as arrays
+	n_init of shape (R, q) and c_init of shape (R, q, q). Every step infers the assignments of all R restarts together
+	with the flooding belief propagation algorithm starting from the messages of the previous step, and a restart stops
+	being updated once its parameters converge.
+	Returns the most probable group assignment and the Bethe free energy of each restart.
+	"""
+	# CSR arrays of the graph, computed once for all restarts and steps
+	csr = list_to_csr(adj_list)
+	# Number of restarts
+	R = len(n_init)
+
+	# Initial values of arrays n and c
+	n = np.array(n_init, dtype = float)
+	c = np.array(c_init, dtype = float)
+	groups = np.zeros((R, len(adj_list)), dtype = np.int64)
+	f_BP = np.zeros(R)
+	# The messages of the previous step
+	messages = None
+
+	# The restarts whose parameters have not converged yet
+	active = np.ones(R, dtype = bool)
+	t = 0
+	while np.any(active) and t < tmax_learn:
+		t += 1
+
+		# Values of the arrays n and c of the active restarts before changes are made
+		n_old = n[active]
+		c_old = c[active]
+
+		# Most probable group of each node and the free energy of this configuration, for every active restart (the
+		# "external field" being recomputed from the messages, as in BP_learning)
+		init_messages = None if messages is None else messages[active]
+		n_new, c_new, groups[active], f_BP[active], new_messages, _ = BP_flood_batch(q, n_old, c_old, csr, crit_infer, tmax_infer, len(n_old), damping, init_messages, True)
+		if messages is None:
+			messages = new_messages
+		else:
+			messages[active] = new_messages
+		n[active] = n_new
+		c[active] = c_new
+
+		# Updating the convergence measure of each active restart
+		conv = np.sum(np.fabs(n_new - n_old), axis = 1) + np.sum(np.fabs(c_new - c_old), axis = (1, 2))
+		active[active] = conv > crit_learn
+	# Returns the estimated assignments of the nodes and their Bethe free energies
+	return groups, f_BP
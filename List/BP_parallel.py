@@ -0,0 +1,131 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.util import Finalize
+from BP_learn import BP_learning
+from csr_graph import CSRGraph
+from list_to_csr import list_to_csr
+
+
+# The graph seen by the current worker process, attached from shared memory
+__graph = {}
+
+
+def run_restarts(q, n, c, adj_list, criterium, t_max, inference, nb_restarts, n_jobs = 1, seed = None):
+	"""
+	Runs nb_restarts independent applications of the inference function (BP_Inference or BP_Inference_flood) on n_jobs
+	processes, and returns the group assignment and free energy of each restart
+	"""
+	return __run(__infer_task, (q, n, c, criterium, t_max, inference), adj_list, nb_restarts, n_jobs, seed)
+
+
+def run_learning(q, c_max, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn, inference, nb_iterations, n_jobs = 1, seed = None):
+	"""
+	Runs nb_iterations applications of the BP_learning algorithm from independent random initializations of the group
+	parameters on n_jobs processes, and returns the group assignment and free energy of each initialization
+	"""
+	return __run(__learn_task, (q, c_max, crit_infer, crit_learn, tmax_infer, tmax_learn, inference), adj_list, nb_iterations, n_jobs, seed)
+
+
+def __run(task, args, adj_list, nb_tasks, n_jobs, seed):
+	"""
+	Runs nb_tasks applications of task, each one with its own random stream spawned from seed, so that the results do not
+	depend on n_jobs (the caller's random state is left as it was). The graph is placed once in shared memory, where every
+	worker process reads it from.
+	"""
+	# Independent seeds for each task
+	seeds = [child.generate_state(4) for child in np.random.SeedSequence(seed).spawn(nb_tasks)]
+	# A negative number of jobs counts back from the number of CPUs (-1 for all of them)
+	if n_jobs == 0:
+		raise Exception("The number of jobs cannot be 0!")
+	if n_jobs < 0:
+		n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+
+	if n_jobs == 1:
+		# The tasks are run on this process, whose random state is given back to the caller once they are done
+		__graph['adj_list'] = adj_list
+		state = np.random.get_state()
+		try:
+			return [task(args, s) for s in seeds]
+		finally:
+			np.random.set_state(state)
+			__graph.clear()
+
+	# CSR arrays of the graph and the code of each edge's reverse
+	csr = list_to_csr(adj_list)
+
+	# Copies the graph's arrays to shared memory blocks
+	blocks = []
+	try:
+		for array in csr:
+			block = SharedMemory(create = True, size = max(array.nbytes, 1))
+			blocks.append(block)
+			np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf)[:] = array
+		shapes = [(block.name, array.shape, array.dtype.str) for block, array in zip(blocks, csr)]
+
+		with Pool(min(n_jobs, nb_tasks), initializer = __attach, initargs = (shapes,)) as pool:
+			results = pool.starmap(task, [(args, s) for s in seeds])
+			# The workers exit on their own (instead of being terminated), detaching from the shared memory
+			pool.close()
+			pool.join()
+		return results
+	finally:
+		for block in blocks:
+			block.close()
+			block.unlink()
+
+
+def __attach(shapes):
+	"""
+	Initializes a worker process: attaches the graph's arrays from shared memory, and detaches from them when the process
+	exits
+	"""
+	__graph['blocks'] = [SharedMemory(name = name) for name, shape, dtype in shapes]
+	indptr, indices, reverse = (np.ndarray(shape, dtype = dtype, buffer = block.buf) for block, (name, shape, dtype) in zip(__graph['blocks'], shapes))
+	Finalize(None, __detach, exitpriority = 10)
+
+	# The graph is passed to the belief propagation functions in place of an adjacency list: the flooding ones read its
+	# shared CSR arrays directly, and the adjacency list is only built for the others
+	graph = CSRGraph(indptr, indices)
+	graph.reverse = reverse
+	__graph['adj_list'] = graph
+
+
+def __detach():
+	"""
+	Finalizes a worker process: drops the views of the graph's arrays and closes the shared memory blocks
+	"""
+	blocks = __graph.pop('blocks', [])
+	__graph.clear()
+	for block in blocks:
+		block.close()
+
+
+def __infer_task(args, seed):
+	"""
+	A single application of the inference function, with its own random stream
+	"""
+	q, n, c, criterium, t_max, inference = args
+	np.random.seed(seed)
+	est_prop, est_edges, groups, f_BP = inference(q, n, c, __graph['adj_list'], criterium, t_max)
+	return groups, f_BP
+
+
+def __learn_task(args, seed):
+	"""
+	A single application of the BP_learning algorithm from a random initialization, with its own random stream
+	"""
+	q, c_max, crit_infer, crit_learn, tmax_infer, tmax_learn, inference = args
+	np.random.seed(seed)
+
+	# Random initialization of each group's size
+	n = np.random.rand(q)
+	n /= np.sum(n)
+
+	# Random initialization of the (symmetric) edge matrix
+	c = np.triu(np.random.rand(q, q))
+	c += np.triu(c, 1).T
+	c *= c_max
+
+	return BP_learning(q, n, c, __graph['adj_list'], crit_infer, crit_learn, tmax_infer, tmax_learn, inference)
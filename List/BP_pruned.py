@@ -0,0 +1,255 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from BP_flood import BP_flood_batch
+from BP_infer import free_energy_edges
+from affinity import affinity_product, log_clipped
+from list_to_csr import list_to_csr
+from two_core import two_core
+
+
+def BP_Inference_pruned(q, n, c, adj_list, criterium, t_max, init_messages = None, return_state = False, c_structure = None, damping = 0.5):
+	"""
+	Runs the flooding belief propagation algorithm on the 2-core of the graph, the trees hanging from the core being
+	updated along with it. The messages going up a tree only depend on the shape of the subtree they leave, so they are
+	updated once per type of subtree instead of once per edge, and the messages going down the trees are updated by a
+	single array operation over the peeled nodes, so that the trees cost less per step than the updates of all of their
+	edges by BP_Inference_flood, whose fixed point is found. The trees start from the messages given by the initial
+	field and core messages (init_messages then only giving the messages of the core).
+	Takes the same arguments and returns the same values as BP_Inference.
+	"""
+	# CSR arrays of the graph and the code of each edge's reverse
+	indptr, indices, reverse = list_to_csr(adj_list)
+	# Number of nodes on the graph
+	N = len(indptr) - 1
+	# The number of directed edges
+	M = len(indices)
+	# The (0-indexed) tail of each directed edge
+	tails = np.repeat(np.arange(N), np.diff(indptr))
+	# The function computing c times messages
+	c_dot = affinity_product(c, c_structure)
+
+	# The round on which each node is peeled (-1 for the core) and the parent of each peeled node
+	layer, parent, order = two_core(indptr, indices)
+	core = layer == -1
+	# Number of nodes in the core and of peeled nodes
+	N_core = np.sum(core)
+	P = N - N_core
+	core_index = np.cumsum(core) - 1
+
+	# The passes over the trees work on the peeled nodes (those with a parent, numbered in the order they are peeled,
+	# followed by the roots of the isolated trees) and on the core nodes they hang from, so that they cost O(P) per step
+	has_parent = parent[order] >= 0
+	peeled = np.concatenate((order[has_parent], order[~has_parent]))
+	H = np.sum(has_parent)
+	attached = np.unique(parent[peeled[:H]][core[parent[peeled[:H]]]])
+	local = np.full(N, -1, dtype = np.int64)
+	local[peeled] = np.arange(P)
+	local[attached] = P + np.arange(len(attached))
+	local_parents = local[parent[peeled[:H]]]
+	# The first and last + 1 positions of the peeled nodes of each round which have a parent
+	bounds = np.searchsorted(layer[peeled[:H]], np.arange(np.max(layer, initial = -1) + 2))
+	bounds = np.unique(bounds)
+
+	# The type of each peeled node, the first and last + 1 types of each round and the matrices counting the children of
+	# each type of the types, roots and core nodes
+	types, type_bounds, type_children, root_children, attached_children = __subtree_types(bounds, local_parents, P, len(attached))
+	nb_types = type_children.shape[0]
+	# The number of edges going up from each type, and the types of the peeled nodes which have a parent
+	type_counts = np.bincount(types[:H], minlength = nb_types)
+	hanging_types = types[:H]
+
+	# The code of the edge from each peeled node to its parent
+	up_code = np.full(N, -1, dtype = np.int64)
+	up, = np.where(parent[tails] == indices)
+	up_code[tails[up]] = up
+
+	# CSR arrays of the core, whose edges keep their order
+	core_edges, = np.where(core[tails] & core[indices])
+	core_indptr = np.zeros(N_core + 1, dtype = np.int64)
+	np.cumsum(np.bincount(core_index[tails[core_edges]], minlength = N_core), out = core_indptr[1:])
+	core_indices = core_index[indices[core_edges]]
+	# The reverse of a core edge is a core edge
+	core_codes = np.full(M, -1, dtype = np.int64)
+	core_codes[core_edges] = np.arange(len(core_edges))
+	core_csr = (core_indptr, core_indices, core_codes[reverse[core_edges]])
+
+	# The messages going up from each type of subtree and down each peeled node's edge to its parent, the logs of c times
+	# the messages going up, the sums of the logs of c times the messages each type receives from its children and each
+	# position receives from all of its neighbors, the marginal probabilities of the peeled nodes and the sums of the
+	# logs of c times the messages each core node receives from its trees
+	up_messages = np.zeros((nb_types, q))
+	log_up = np.zeros((nb_types, q))
+	in_sum = np.zeros((nb_types, q))
+	down_messages = np.zeros((H, q))
+	log_in_sum = np.zeros((P + len(attached), q))
+	marg_peeled = np.zeros((P, q))
+	log_fixed = np.zeros((N_core, q))
+
+	def fringe(h, log_core, init = False):
+		"""
+		Updates the messages of the trees for the "external field" h, from the messages of the previous step (or from
+		the leaves up and then from the core down if init is True), the core nodes receiving the sums log_core of the
+		logs of c times the messages of the core (of the single run on the core). Returns the sums of the logs of c
+		times the messages each core node receives from its trees, the sum of c times the marginal probabilities of the
+		peeled nodes and the sum of the differences of the new to the old messages
+		"""
+		log_field = log_clipped(n) - h[0]
+		if init:
+			# Going up: each type of subtree sends to its parent the product of the messages of its children's types
+			for start, end in type_bounds:
+				in_sum[start : end] = type_children[start : end] @ log_up
+				up_messages[start : end] = __normalize(log_field + in_sum[start : end])
+				log_up[start : end] = log_clipped(c_dot(up_messages[start : end], True))
+			log_in_sum[P:] = attached_children @ log_up + log_core[0, core_index[attached]]
+			# Going down: each parent sends to a peeled node the product of the messages of its other neighbors
+			for first, last in zip(bounds[-2::-1], bounds[:0:-1]):
+				down_messages[first : last] = __normalize(log_field + log_in_sum[local_parents[first : last]] - log_up[hanging_types[first : last]])
+				log_in_sum[first : last] = in_sum[hanging_types[first : last]] + log_clipped(c_dot(down_messages[first : last], True))
+			conv = 0
+		else:
+			# The new messages, from the products over the previous messages of the other neighbors, are damped as on
+			# the flooding schedule
+			new_up = (1 - damping)*__normalize(log_field + in_sum) + damping*up_messages
+			new_down = (1 - damping)*__normalize(log_field + log_in_sum[local_parents] - log_up[hanging_types]) + damping*down_messages
+			conv = np.dot(type_counts, np.sum(np.fabs(new_up - up_messages), axis = 1)) + np.sum(np.fabs(new_down - down_messages))
+			up_messages[:] = new_up
+			down_messages[:] = new_down
+			log_up[:] = log_clipped(c_dot(up_messages, True))
+			in_sum[:] = type_children @ log_up
+			log_in_sum[:H] = in_sum[hanging_types] + log_clipped(c_dot(down_messages, True))
+			log_in_sum[P:] = attached_children @ log_up + log_core[0, core_index[attached]]
+
+		log_fixed[core_index[attached]] = attached_children @ log_up
+		log_in_sum[H : P] = root_children @ log_up
+		marg_peeled[:] = __normalize(log_field + log_in_sum[:P])
+		if init:
+			return log_fixed[None], c_dot(np.sum(marg_peeled, axis = 0))[None]
+		return log_fixed[None], c_dot(np.sum(marg_peeled, axis = 0))[None], np.array([conv])
+
+	# The field of the factorized solution, from which the peeled nodes start
+	h = c_dot(n)
+	if N_core > 0:
+		core_messages = None if init_messages is None else np.array(init_messages, dtype = float)[None, core_edges]
+		result = BP_flood_batch(q, n, c, core_csr, criterium, t_max, 1, damping, core_messages, True, c_structure, nb_fixed = P, init_field = h, fringe = fringe)
+		core_messages, h = result[4][0], result[5][0]
+	else:
+		# Without a core, the trees are iterated alone, their field being damped as on the flooding schedule
+		log_core = np.zeros((1, 0, q))
+		fringe(h[None], log_core, True)
+		conv = criterium + 1
+		t = 0
+		while conv > criterium and t < t_max:
+			t += 1
+			_, field_peeled, conv = fringe(h[None], log_core)
+			h = damping*h + (1 - damping)*field_peeled[0]/N
+
+	# The marginal probabilities of all nodes, those of the core being given by the sums of the logs of the last step
+	marg_prob = np.zeros((N, q))
+	log_core = np.zeros((N_core, q))
+	if N_core > 0:
+		np.add.at(log_core, core_indices, log_clipped(c_dot(core_messages, True)))
+	marg_prob[core] = __normalize(log_clipped(n) - h + log_core + log_fixed)
+	marg_prob[peeled] = marg_peeled
+	h = c_dot(np.sum(marg_prob, axis = 0))/N
+
+	# The messages of all edges
+	messages = np.zeros((M, q))
+	if N_core > 0:
+		messages[core_edges] = core_messages
+	messages[up_code[peeled[:H]]] = up_messages[hanging_types]
+	messages[reverse[up_code[peeled[:H]]]] = down_messages[:H]
+
+	# The estimated proportion of nodes on each group
+	est_prop = np.sum(marg_prob, axis = 0)/N
+
+	# The belief propagation estimate for the free energy and the estimated edge matrix
+	f_BP, est_edges = free_energy_edges(N, est_prop, c, h, messages, tails, reverse, c_structure)
+
+	# An array containing the most probable group for each node
+	groups = np.argmax(marg_prob, axis = 1) + 1
+
+	if return_state:
+		return est_prop, est_edges, groups, f_BP, messages, h
+	return est_prop, est_edges, groups, f_BP
+
+
+def __subtree_types(bounds, local_parents, P, A):
+	"""
+	Numbers the types of the subtrees hanging from the peeled nodes, two nodes having the same type if their children have
+	the same types (so that they send the same message up). The nodes are given by their positions: the peeled ones which
+	have a parent, whose parents are at local_parents and which are peeled on the rounds of positions bounds[k] to
+	bounds[k + 1] - 1, then the roots of the isolated trees up to P and the A core nodes they hang from.
+	Returns the type of each peeled node, the first and last + 1 types found on each round, and the sparse matrices
+	counting the children of each type of the types, of the roots and of the core nodes
+	"""
+	# The children of each position, sorted by position
+	children = np.argsort(local_parents, kind = 'stable')
+	children_ptr = np.zeros(P + A + 1, dtype = np.int64)
+	np.cumsum(np.bincount(local_parents, minlength = P + A), out = children_ptr[1:])
+
+	types = np.zeros(P, dtype = np.int64)
+	nb_types = 0
+	# The first and last + 1 types of each round and their (type, child type) pairs
+	round_pairs = []
+	for first, last in zip(bounds[:-1], bounds[1:]):
+		nodes = np.arange(first, last)
+		start = nb_types
+		counts = children_ptr[nodes + 1] - children_ptr[nodes]
+		rows, cols = [np.zeros(0, dtype = np.int64)], [np.zeros(0, dtype = np.int64)]
+		# Nodes with different numbers of children have different types, and the sorted types of the children of the
+		# others tell whether they have the same type
+		for m in np.unique(counts):
+			same = nodes[counts == m]
+			child_types = np.sort(types[children[children_ptr[same][:, None] + np.arange(m)]], axis = 1)
+			signatures, inverse = np.unique(child_types, axis = 0, return_inverse = True)
+			types[same] = nb_types + inverse.ravel()
+			rows.append(np.repeat(np.arange(nb_types, nb_types + len(signatures)) - start, m))
+			cols.append(signatures.ravel())
+			nb_types += len(signatures)
+		round_pairs.append((start, nb_types, np.concatenate(rows), np.concatenate(cols)))
+
+	def children_of(positions):
+		"""
+		Returns the sparse matrix counting the children of each type of the given positions
+		"""
+		counts = children_ptr[positions + 1] - children_ptr[positions]
+		rows = np.repeat(np.arange(len(positions)), counts)
+		# The codes of the children of each position, which are contiguous
+		codes = np.arange(len(rows)) + np.repeat(children_ptr[positions] - np.cumsum(counts) + counts, counts)
+		return __count_matrix(rows, types[children[codes]], (len(positions), nb_types))
+
+	# The children of the types, of the roots and of the core nodes
+	type_bounds = [(start, end) for start, end, _, _ in round_pairs]
+	type_rows = np.concatenate([rows + start for start, _, rows, _ in round_pairs] + [np.zeros(0, dtype = np.int64)])
+	type_cols = np.concatenate([cols for _, _, _, cols in round_pairs] + [np.zeros(0, dtype = np.int64)])
+	type_children = __count_matrix(type_rows, type_cols, (nb_types, nb_types))
+	return types, type_bounds, type_children, children_of(np.arange(len(local_parents), P)), children_of(P + np.arange(A))
+
+
+def __count_matrix(rows, cols, shape):
+	"""
+	Returns the sparse matrix of the given shape counting the (row, col) pairs
+	"""
+	return csr_matrix((np.ones(len(rows)), (rows, cols)), shape = shape)
+
+
+def __normalize(log_values):
+	"""
+	Exponentiates the last axis of log_values and normalizes it to have sum 1
+	"""
+	values = np.exp(log_values - __max_groups(log_values)[..., None])
+	values /= np.dot(values, np.ones(values.shape[-1]))[..., None]
+	return values
+
+
+def __max_groups(values):
+	"""
+	Returns the maximum over the last axis of values. For a few groups, taking the maximum group by group is much faster
+	than a reduction over such a short axis
+	"""
+	if values.shape[-1] > 8:
+		return np.max(values, axis = -1)
+	max_values = np.copy(values[..., 0])
+	for k in range(1, values.shape[-1]):
+		np.maximum(max_values, values[..., k], out = max_values)
+	return max_values
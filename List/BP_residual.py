@@ -0,0 +1,143 @@
+import heapq
+import numpy as np
+from affinity import affinity_product, log_clipped
+from BP_infer import free_energy_edges
+from list_to_csr import list_to_csr
+
+
+def BP_Inference_residual(q, n, c, adj_list, criterium, t_max, init_messages = None, return_state = False, cutoff = None, max_updates = None, c_structure = None):
+	"""
+	Runs the belief propagation algorithm with a residual schedule: the messages whose update would change them the most
+	are updated first, using a priority queue of the pending changes (residuals). Only the messages going out of the head
+	of an updated message have their residuals recomputed after it, and the "external field" h, which changes the
+	residuals of all messages, is accounted for by computing all of them again every M updates and before stopping.
+	Messages whose residual is below cutoff (criterium/M by default, where M is the number of directed edges) are not
+	updated, and at most max_updates messages are updated (t_max sweeps, i.e. t_max*M updates, by default).
+	Takes the same arguments and returns the same values as BP_Inference.
+	"""
+	# The function computing c times messages
+	c_dot = affinity_product(c, c_structure)
+	# CSR arrays of the graph and the code of each edge's reverse
+	indptr, indices, reverse = list_to_csr(adj_list)
+	# Number of nodes on the graph
+	N = len(indptr) - 1
+	# The number of directed edges
+	M = len(indices)
+	# The (0-indexed) tail of each directed edge
+	tails = np.repeat(np.arange(N), np.diff(indptr))
+
+	if cutoff is None:
+		cutoff = criterium/max(M, 1)
+	if max_updates is None:
+		max_updates = t_max*M
+
+	# For each directed edge we associate a "message" array of size q, with norm 1
+	messages = np.random.rand(M, q) if init_messages is None else np.array(init_messages, dtype = float)
+	messages /= np.sum(messages, axis = 1, keepdims = True)
+
+	# The log of c times each message (clipped, so that the factors given by zero entries of c can be removed)
+	log_cm = log_clipped(c_dot(messages, True))
+	# For each node u, the log of the product of c times the messages (k, u) over all of u's neighbors k
+	log_prod = np.zeros((N, q))
+	np.add.at(log_prod, indices, log_cm)
+
+	# For each node we associate the marginal probability of it belonging to each group, and the "external field" h is
+	# initialized from them (both being computed again with h on the first step)
+	marg_prob = __normalize(log_clipped(n) + log_prod)
+	h = c_dot(np.sum(marg_prob, axis = 0))/N
+
+	# The residual of every message, kept in a priority queue (largest first) along with a version number of the message,
+	# so that the entries of a message made out of date by a newer entry are ignored (filled on the first step)
+	version = np.zeros(M, dtype = np.int64)
+	queue = []
+
+	old_marg_prob = np.zeros(q)
+	updates = 0
+	# Number of updates since all residuals were last computed
+	since_scored = 0
+	while updates < max_updates:
+		# Every update changes h, and with it the residuals of all messages, while only those of the messages going out of
+		# the updated head are recomputed: all of them are computed again every M updates and once the queue is empty,
+		# the run only stopping if none is above cutoff then
+		if not queue or since_scored >= M:
+			# The updates of the products accumulate rounding errors, so they are computed again as well, and so are the
+			# marginal probabilities, which the updates of h leave out, and h from them
+			log_cm = log_clipped(c_dot(messages, True))
+			log_prod = np.zeros((N, q))
+			np.add.at(log_prod, indices, log_cm)
+			marg_prob = __normalize(log_clipped(n) - h + log_prod)
+			h = c_dot(np.sum(marg_prob, axis = 0))/N
+			version += 1
+			residuals = __residuals(np.arange(M), n, h, messages, log_cm, log_prod, tails, reverse)
+			queue = [(-res, e, version[e]) for e, res in enumerate(residuals) if res > cutoff]
+			heapq.heapify(queue)
+			since_scored = 0
+			if not queue:
+				break
+
+		res, i, vers = heapq.heappop(queue)
+		if vers != version[i]:
+			continue
+		updates += 1
+		since_scored += 1
+
+		# Vertices composing edge code i
+		u, v = tails[i], indices[i]
+
+		# Updating the message with the current "external field"
+		log_message = log_clipped(n) - h + log_prod[u] - log_cm[reverse[i]]
+		messages[i] = __normalize(log_message)
+
+		# Updating the log of c times the message and the product of node v
+		log_diff = log_clipped(c_dot(messages[i], True)) - log_cm[i]
+		log_cm[i] += log_diff
+		log_prod[v] += log_diff
+
+		margv = marg_prob[v]
+		# The marginal probability array of node v before changes are made
+		np.copyto(old_marg_prob, margv)
+		# Updating the marginal probability array of node v (the factors are scaled by their maximum, which the
+		# normalization removes, and kept above the smallest positive float so that they never all vanish)
+		margv *= np.exp(np.maximum(log_diff - np.max(log_diff), np.log(np.finfo(float).tiny)))
+		margv /= np.sum(margv)
+
+		# Updating the external field h
+		h += c_dot(margv - old_marg_prob)/N
+
+		# The messages going out of v, except the one going back to u, have new residuals
+		out = np.arange(indptr[v], indptr[v + 1])
+		out = out[indices[out] != u]
+		version[out] += 1
+		for e, res in zip(out, __residuals(out, n, h, messages, log_cm, log_prod, tails, reverse)):
+			if res > cutoff:
+				heapq.heappush(queue, (-res, e, version[e]))
+
+	# The estimated proportion of nodes on each group
+	est_prop = np.sum(marg_prob, axis = 0)/N
+
+	# The belief propagation estimate for the free energy and the estimated edge matrix
+	f_BP, est_edges = free_energy_edges(N, est_prop, c, h, messages, tails, reverse, c_structure)
+
+	# An array containing the most probable group for each node
+	groups = np.argmax(marg_prob, axis = 1) + 1
+
+	if return_state:
+		return est_prop, est_edges, groups, f_BP, messages, h
+	return est_prop, est_edges, groups, f_BP
+
+
+def __residuals(edges, n, h, messages, log_cm, log_prod, tails, reverse):
+	"""
+	Returns the L1 distance between the current messages of the given edges and their updated values
+	"""
+	new_messages = __normalize(log_clipped(n) - h + log_prod[tails[edges]] - log_cm[reverse[edges]])
+	return np.sum(np.fabs(new_messages - messages[edges]), axis = -1)
+
+
+def __normalize(log_values):
+	"""
+	Exponentiates the last axis of log_values and normalizes it to have sum 1
+	"""
+	values = np.exp(log_values - np.max(log_values, axis = -1, keepdims = True))
+	values /= np.sum(values, axis = -1, keepdims = True)
+	return values
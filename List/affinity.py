@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def affinity_product(c, structure = None, tol = 1e-10, dtype = float):
+	"""
+	Returns a function computing the product of the edge matrix c with arrays of messages (along their last axis).
+	The structure of c decides how the product is computed:
+		'planted': c = c_out*J + delta*I (as built by construct_edge_matrix), in O(q) per message
+		'lowrank': c = U*diag(s)*U^T with rank r < q, in O(r*q) per message
+		'dense': any other matrix, in O(q^2) per message
+	If structure is None, it is detected from c when there are enough groups for the structure to pay off (below that,
+	a dense product of NumPy is faster than the few more array operations).
+	c may also hold one edge matrix per run (shape (R, q, q)), and then the messages must have shape (R, ..., q).
+	The returned function takes the messages and a flag telling whether they are known to have sum 1, which saves the
+	sums of the 'planted' product. The products are computed in the precision dtype of the messages.
+	"""
+	c = np.asarray(c, dtype = float)
+	q = c.shape[-1]
+	if structure is None:
+		structure = detect_structure(c, tol) if q >= 16 else 'dense'
+
+	if structure == 'planted':
+		# The off-diagonal and the diagonal minus off-diagonal values
+		c_out = c[..., 0, 1] if q > 1 else np.zeros(c.shape[:-2])
+		delta = c[..., 0, 0] - c_out
+		if c.ndim == 3:
+			c_out = c_out[:, None, None]
+			delta = delta[:, None, None]
+		c_out = np.asarray(c_out, dtype = dtype)
+		delta = np.asarray(delta, dtype = dtype)
+		ones = np.ones(q, dtype = dtype)
+
+		def product(messages, normalized = False):
+			values = delta*messages
+			values += c_out if normalized else c_out*np.dot(messages, ones)[..., None]
+			return values
+		return product
+
+	if structure == 'lowrank':
+		# Eigendecomposition of the (symmetric) edge matrix, keeping only its largest eigenvalues (in module)
+		s, U = np.linalg.eigh(c)
+		rank = max(1, np.max(np.sum(np.fabs(s) > tol*np.max(np.fabs(s)), axis = -1)))
+		order = np.argsort(-np.fabs(s), axis = -1)[..., :rank]
+		s = np.take_along_axis(s, order, axis = -1)
+		U = np.take_along_axis(U, order[..., None, :], axis = -1)
+		if c.ndim == 3:
+			s = s[:, None]
+		s = s.astype(dtype)
+		U = U.astype(dtype)
+		U_T = np.swapaxes(U, -1, -2)
+		return lambda messages, normalized = False: np.matmul(np.matmul(messages, U)*s, U_T)
+
+	# Dense product
+	c_T = np.swapaxes(c, -1, -2).astype(dtype)
+	return lambda messages, normalized = False: np.matmul(messages, c_T)
+
+
+def log_clipped(values):
+	"""
+	Returns the log of values (products of c with messages, or group proportions), taking the zeros (given by the zero
+	entries of c, e.g. for messages with a single nonzero group, or by a vanished group) as the smallest positive number
+	of their precision, so that the logs stay finite and can be removed from their sums
+	"""
+	values = np.asarray(values)
+	return np.log(np.maximum(values, np.finfo(values.dtype).tiny))
+
+
+def detect_structure(c, tol = 1e-10):
+	"""
+	Returns 'planted' if the edge matrix c (or every edge matrix of a stack of them) is of the form c_out*J + delta*I,
+	'lowrank' if its rank is at most half the number of groups and 'dense' otherwise
+	"""
+	c = np.asarray(c, dtype = float)
+	q = c.shape[-1]
+	scale = tol*max(np.max(np.fabs(c)), 1)
+
+	# Diagonal and off-diagonal values
+	diag = np.diagonal(c, axis1 = -2, axis2 = -1)
+	off = c[..., ~np.eye(q, dtype = bool)]
+	if np.all(np.fabs(diag - diag[..., :1]) <= scale) and (q == 1 or np.all(np.fabs(off - off[..., :1]) <= scale)):
+		return 'planted'
+
+	# Rank of the edge matrix
+	s = np.linalg.eigvalsh(c)
+	rank = np.max(np.sum(np.fabs(s) > tol*np.max(np.fabs(s)), axis = -1))
+	if 2*rank <= q:
+		return 'lowrank'
+	return 'dense'
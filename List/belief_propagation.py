@@ -1,22 +1,36 @@
 import numpy as np
 from BP_infer import BP_Inference
-from BP_learn import BP_learning
+from BP_flood import BP_Inference_batch
+from BP_learn import BP_learning, BP_learning_batch
+from BP_parallel import run_restarts, run_learning
 from overlap import overlap
 
 
-def infer_assignment(N, q, adj_list, group, n, c, criterium, t_max):
+def infer_assignment(N, q, adj_list, group, n, c, criterium, t_max, inference = BP_Inference, nb_restarts = 3, n_jobs = 1, seed = None):
 	"""
 	Given the graph's true data, infers the group assignment by belief propagation
 	Returns the (normalized) overlap to the actual group assignment and the Bethe free energy
+	The inference is done by the function inference (BP_Inference or BP_Inference_flood)
+	If n_jobs is not 1 or a seed is given, the restarts are spread over n_jobs processes (all CPUs but -n_jobs - 1 if
+	n_jobs < 0), each with its own random stream spawned from seed
 	"""
 	# Initialization of the optimal values
 	f_min = 0
 	groups_opt = np.zeros(N, dtype = np.int8)
 
-	# We take the best of 3 applications of BP_Inference (measured by its free energy) to wash away bad random initializations
-	for _ in range(3):
+	if n_jobs != 1 or seed is not None:
+		# The independent restarts are run in parallel
+		for groups, f_BP in run_restarts(q, n, c, adj_list, criterium, t_max, inference, nb_restarts, n_jobs, seed):
+			if f_BP < f_min:
+				f_min = f_BP
+				np.copyto(groups_opt, groups)
+		return overlap(N, q, n, groups_opt, group), f_min
+
+	# We take the best of nb_restarts applications of BP_Inference (measured by its free energy) to wash away bad random
+	# initializations
+	for _ in range(nb_restarts):
 		# The group assignment given by the belief propagation algorithm and its free energy
-		est_prop, est_edges, groups, f_BP = BP_Inference(q, n, c, adj_list, criterium, t_max)
+		est_prop, est_edges, groups, f_BP = inference(q, n, c, adj_list, criterium, t_max)
 
 		# If the current free energy is smaller than the minimum free energy, we update the group assignment
 		if f_BP < f_min:
@@ -27,10 +41,27 @@ def infer_assignment(N, q, adj_list, group, n, c, criterium, t_max):
 	return overlap(N, q, n, groups_opt, group), f_min
 
 
-def learn_parameters(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_learn = 0.2, tmax_infer = 12, tmax_learn = 8):
+def infer_assignment_batch(N, q, adj_list, group, n, c, criterium, t_max, nb_restarts = 3):
+	"""
+	Given the graph's true data, infers the group assignment by running nb_restarts random initializations of the
+	flooding belief propagation algorithm together
+	Returns the (normalized) overlap to the actual group assignment, the minimal Bethe free energy and the free energy of
+	every restart
+	"""
+	# The group assignment with the lowest free energy among all restarts
+	est_prop, est_edges, groups, f_min, f_BP = BP_Inference_batch(q, n, c, adj_list, criterium, t_max, nb_restarts)
+
+	# Returns the overlap between the infered group assignment and the actual assignment and the free energies
+	return overlap(N, q, n, groups, group), f_min, f_BP
+
+
+def learn_parameters(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_learn = 0.2, tmax_infer = 12, tmax_learn = 8, inference = BP_Inference, n_jobs = 1, seed = None):
 	"""
 	Learns the true group parameters of a given graph, and returns the optimal group assignment given by the belief
 	propagation algorithm
+	The inference is done by the function inference (BP_Inference or BP_Inference_flood)
+	If n_jobs is not 1 or a seed is given, the random initializations are spread over n_jobs processes (all CPUs but
+	-n_jobs - 1 if n_jobs < 0), each with its own random stream spawned from seed
 	"""
 	# Number of nodes on the graph
 	N = len(adj_list)
@@ -38,6 +69,14 @@ def learn_parameters(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_l
 	# Optimal values given by the algorithm
 	f_min = 0
 	groups_opt = np.zeros(N, dtype = np.int8)
+
+	if n_jobs != 1 or seed is not None:
+		# The independent initializations are run in parallel
+		for groups, f_BP in run_learning(q, c_max, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn, inference, nb_iterations, n_jobs, seed):
+			if f_BP < f_min:
+				f_min = f_BP
+				np.copyto(groups_opt, groups)
+		return groups_opt
 	for _ in range(nb_iterations):
 		# Random initialization of each group's size
 		n = np.random.rand(q)
@@ -51,7 +90,7 @@ def learn_parameters(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_l
 		c *= c_max
 
 		# Application of the BP_learning algorithm for these initialized values
-		groups, f_BP = BP_learning(q, n, c, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn)
+		groups, f_BP = BP_learning(q, n, c, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn, inference)
 
 		# Updates the optimal values found
 		if f_BP < f_min:
@@ -60,3 +99,25 @@ def learn_parameters(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_l
 
 	# Returns the optimal group assignment found
 	return groups_opt
+
+
+def learn_parameters_batch(adj_list, q, c_max, nb_iterations, crit_infer = 0.2, crit_learn = 0.2, tmax_infer = 12, tmax_learn = 8):
+	"""
+	Learns the true group parameters of a given graph from nb_iterations random initializations handled together by the
+	flooding belief propagation algorithm, and returns the optimal group assignment and the free energy of every
+	initialization
+	"""
+	# Random initialization of each group's size
+	n = np.random.rand(nb_iterations, q)
+	n /= np.sum(n, axis = 1, keepdims = True)
+
+	# Random initialization of the (symmetric) edge matrix
+	c = np.triu(np.random.rand(nb_iterations, q, q))
+	c += np.swapaxes(np.triu(c, 1), 1, 2)
+	c *= c_max
+
+	# Application of the BP_learning algorithm for all initialized values
+	groups, f_BP = BP_learning_batch(q, n, c, adj_list, crit_infer, crit_learn, tmax_infer, tmax_learn)
+
+	# Returns the group assignment with the lowest free energy and the free energies of all initializations
+	return groups[np.argmin(f_BP)], f_BP
@@ -0,0 +1,118 @@
+import ast
+import json
+import numpy as np
+from csr_graph import CSRGraph
+
+
+# The first bytes of a binary graph file, and the version of the format written
+MAGIC = b'SBMGRAPH'
+VERSION = 1
+# The arrays of a graph file are aligned to this number of bytes
+__ALIGNMENT = 64
+
+
+def write_graph(file, N, q, indptr, indices, group, group_prop, edge_prop):
+	"""
+	Writes a graph to a binary file: the magic bytes, the format version and the length of a JSON header (as two
+	little-endian uint32), the header (holding N, q and the dtype, shape and offset of each array) and the arrays
+	indptr, indices, group, group_prop and edge_prop. The arrays start after the header at a multiple of 64 bytes, each
+	one at an offset from there which is also a multiple of 64 bytes, so that read_graph can memory-map them.
+	"""
+	arrays = {
+		'indptr': np.ascontiguousarray(indptr, dtype = np.int64),
+		'indices': np.ascontiguousarray(indices, dtype = np.int32 if N < 2**31 else np.int64),
+		'group': np.ascontiguousarray(group, dtype = np.int8),
+		'group_prop': np.ascontiguousarray(group_prop, dtype = np.float64),
+		'edge_prop': np.ascontiguousarray(edge_prop, dtype = np.float64),
+	}
+
+	# The header, with the offset of each array from the start of the arrays
+	header = {'N': int(N), 'q': int(q), 'arrays': {}}
+	offset = 0
+	for name, array in arrays.items():
+		header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+		offset = __align(offset + array.nbytes)
+	header = json.dumps(header).encode()
+
+	with open(file, 'wb') as f:
+		f.write(MAGIC)
+		f.write(np.array([VERSION, len(header)], dtype = '<u4').tobytes())
+		f.write(header)
+		for array in arrays.values():
+			f.write(b'\0'*(__align(f.tell()) - f.tell()))
+			f.write(array.tobytes())
+
+
+def is_graph_file(file):
+	"""
+	Returns True if the file is a binary graph file written by write_graph
+	"""
+	with open(file, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+
+def read_graph(file):
+	"""
+	Reads a binary graph file written by write_graph, memory-mapping its arrays (nothing is copied), and returns the
+	number of nodes, the number of groups, the graph (as a CSRGraph), the group assignment of each node, the proportion
+	of nodes on each group and the edge probability matrix times N
+	"""
+	with open(file, 'rb') as f:
+		if f.read(len(MAGIC)) != MAGIC:
+			raise Exception("Not a graph file!")
+		version, length = np.frombuffer(f.read(8), dtype = '<u4')
+		if version > VERSION:
+			raise Exception("Unsupported graph file version!")
+		header = json.loads(f.read(int(length)))
+	# The start of the arrays
+	start = __align(len(MAGIC) + 8 + int(length))
+
+	# Memory-maps each array
+	arrays = {}
+	for name, info in header['arrays'].items():
+		shape = tuple(info['shape'])
+		if np.prod(shape) == 0:
+			arrays[name] = np.zeros(shape, dtype = info['dtype'])
+		else:
+			arrays[name] = np.memmap(file, dtype = info['dtype'], mode = 'r', offset = start + info['offset'], shape = shape)
+
+	N = header['N']
+	return N, header['q'], CSRGraph(arrays['indptr'], arrays['indices']), arrays['group'], arrays['group_prop'], arrays['edge_prop']*N
+
+
+def __align(offset):
+	"""
+	Returns the first multiple of the alignment which is not smaller than offset
+	"""
+	return -(-offset//__ALIGNMENT)*__ALIGNMENT
+
+
+def convert_text_file(text_file, graph_file):
+	"""
+	Converts a graph written by the write_in_file method of any of the Graph classes (as an adjacency list, a dense
+	adjacency matrix or the rows and columns of its nonzero elements) to a binary graph file
+	"""
+	with open(text_file, 'r') as f:
+		lines = f.read().splitlines()
+
+	# Number of nodes and number of groups
+	N = int(lines[0])
+	q = int(lines[1])
+
+	# The graph's edges, parsed as literals (without running the file's contents)
+	if lines[2].lstrip().startswith('{'):
+		graph = CSRGraph.from_adj_list(ast.literal_eval(lines[2]))
+		lines = lines[3:]
+	elif lines[2].lstrip().startswith('[['):
+		graph = CSRGraph.from_matrix(np.array(ast.literal_eval(lines[2]), dtype = np.int8))
+		lines = lines[3:]
+	else:
+		graph = CSRGraph.from_row_col(N, ast.literal_eval(lines[2]), ast.literal_eval(lines[3]))
+		lines = lines[4:]
+
+	# Group assignment, proportion of nodes on each group and proportion of edges between groups
+	group = np.array(ast.literal_eval(lines[0]), dtype = np.int8)
+	group_prop = np.array(ast.literal_eval(lines[1]))
+	edge_prop = np.array(ast.literal_eval(lines[2]))
+
+	write_graph(graph_file, N, q, graph.indptr, graph.indices, group, group_prop, edge_prop)
@@ -0,0 +1,11 @@
+from csr_graph import CSRGraph
+
+
+def list_to_csr(adj_list):
+	"""
+	Given the adjacency list of a graph (or a CSRGraph), returns its CSR arrays (indptr, indices) and the reverse-edge index
+	The directed edge code e = indptr[u - 1] + i is the edge from node u to its i-th neighbor, node indices[e] + 1
+	"""
+	graph = CSRGraph.from_adj_list(adj_list)
+	# Returns the CSR arrays and the code of each edge's reverse
+	return graph.indptr, graph.indices, graph.reverse
@@ -2,8 +2,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 from sklearn.cluster import KMeans
-from scipy.sparse import linalg, csr_matrix
+from scipy.sparse import linalg, csr_matrix, bmat, diags, identity
 from overlap import overlap
+from list_to_csr import list_to_csr
+from csr_graph import CSRGraph
+from two_core import two_core
+from itertools import chain
 
 
 def non_backtracking_sparse(adj_list):
@@ -40,21 +44,240 @@ def non_backtracking_sparse(adj_list):
 	return csr_matrix((np.ones(len(row)), (row, col)), shape = (count, count)), in_edges
 
 
-def NB_cluster(N, q, adj_list, group, n, plot_graph = False):
-	# The graph's non-backtracking matrix and in-edges dictionary
-	non_backtr, in_edges = non_backtracking_sparse(adj_list)
+def non_backtracking_operator(adj_list):
+	"""
+	For a graph given by its adjacency list, returns its non-backtracking matrix as a LinearOperator (with the edge codes
+	of non_backtracking_sparse), without building it: the product with a vector gives each edge (u, v) the sum of the
+	values of the edges going out of v minus the value of (v, u), and the product of the transpose gives each edge (v, w)
+	the sum of the values of the edges coming into v minus the value of (w, v)
+	Time: O(|E|) per product		Space: O(|E|)
+	"""
+	graph = CSRGraph.from_adj_list(adj_list)
+	N = graph.nb_nodes
+	tails, heads, reverse = graph.tails, graph.indices, graph.reverse
+	count = len(heads)
+
+	def __node_sums(nodes, x):
+		# The sum of x over the edges of each node (np.bincount only takes real weights)
+		if np.iscomplexobj(x):
+			return __node_sums(nodes, x.real) + 1j*__node_sums(nodes, x.imag)
+		return np.bincount(nodes, weights = x, minlength = N)
+
+	def matvec(x):
+		x = np.ravel(x)
+		return __node_sums(tails, x)[heads] - x[reverse]
+
+	def rmatvec(x):
+		x = np.ravel(x)
+		return __node_sums(heads, x)[tails] - x[reverse]
+
+	return linalg.LinearOperator((count, count), matvec = matvec, rmatvec = rmatvec, dtype = float)
+
+
+def ihara_bass(adj_list):
+	"""
+	For a graph given by its adjacency list, returns the CSR sparse 2N x 2N matrix [[A, I - D], [I, 0]], where A is the
+	adjacency matrix and D the diagonal matrix of the degrees. By the Ihara-Bass formula, its eigenvalues are those of the
+	non-backtracking matrix other than 1 and -1. For an eigenvalue lambda, its eigenvector is (lambda*y, y), where y sums
+	the values of the edges going out of each node on the non-backtracking eigenvector, and (D - I)*y/lambda the values of
+	the edges coming in.
+	Time: O(|E|)		Space: O(|E|)
+	"""
+	graph = CSRGraph.from_adj_list(adj_list)
+	N = graph.nb_nodes
+	adj_matrix = graph.sparse.astype(float)
+	identity_matrix = identity(N, format = 'csr')
+	return bmat([[adj_matrix, identity_matrix - diags(graph.degrees.astype(float))], [identity_matrix, None]], format = 'csr')
+
+
+def pruned_embedding(N, q, adj_list, cache = None, operator = 'edges', start = None):
+	"""
+	Returns the same embedding of the nodes as NB_cluster (the sum of the in-edges' values on the eigenvectors associated
+	to the 2nd, 3rd, ..., qth biggest eigenvalues of the non-backtracking matrix), computing the eigenvectors on the
+	2-core of the graph only. On the trees hanging from the core, the edges going away from the core have value 0 on every
+	eigenvector with nonzero eigenvalue, and the edge (u, p) from a peeled node u to its parent p has value
+	1/lambda times the sum of the values of the edges going out of p, which are filled in from the core to the leaves.
+	The eigenpairs of the core are computed by nb_eigenpairs with the given cache, operator and start (whose rows of the
+	core nodes are kept). With the Ihara-Bass operator, the values of the core edges are rebuilt from the sums of the
+	values of the edges going out of each node (see __ib_edge_values).
+	Returns None if the core is too small to have q eigenvalues.
+	"""
+	# CSR arrays of the graph and the code of each edge's reverse
+	indptr, indices, reverse = list_to_csr(adj_list)
+	# The (0-indexed) tail of each directed edge
+	tails = np.repeat(np.arange(N), np.diff(indptr))
+
+	# The round on which each node is peeled (-1 for the core) and the parent of each peeled node
+	layer, parent, order = two_core(indptr, indices)
+	core = layer == -1
+	core_edges, = np.where(core[tails] & core[indices])
+	if len(core_edges) <= q + 1:
+		return None
+
+	# Adjacency list of the core (with its nodes renumbered), whose edge codes follow core_edges
+	core_nodes, = np.where(core)
+	core_index = np.cumsum(core)
+	core_list = {k + 1: core_index[indices[indptr[u]: indptr[u + 1]][core[indices[indptr[u]: indptr[u + 1]]]]].tolist() for k, u in enumerate(core_nodes)}
+
+	# The core's non-backtracking matrix biggest eigenvalues (in module) and their associated eigenvectors
+	core_start = None if start is None else np.asarray(start, dtype = float).reshape(N, -1)[core_nodes]
+	eig_val, eig_vec = nb_eigenpairs(core_list, q, cache, operator, core_start)
+	# The 2nd, 3rd, ..., qth biggest eigenvalues and their eigenvectors
+	ind = np.argsort(eig_val.real)[: q - 1]
+	eig_val = eig_val[ind]
+	eig_vec = eig_vec[:, ind]
+	if operator == 'ihara_bass':
+		# The values of the core edges, from the sums of the values of the edges going out of their tails and heads
+		eig_vec = __ib_edge_values(eig_val, eig_vec[len(core_nodes):], core_index[tails[core_edges]] - 1, core_index[indices[core_edges]] - 1)
+
+	# The eigenvectors on every edge of the graph, the edges going away from the core having value 0
+	edge_vec = np.zeros((len(indices), q - 1), dtype = complex)
+	edge_vec[core_edges] = eig_vec
+	# The sum of the values of the edges going out of each node
+	out_sum = np.zeros((N, q - 1), dtype = complex)
+	np.add.at(out_sum, tails[core_edges], edge_vec[core_edges])
+
+	# The code of the edge from each peeled node to its parent
+	up_code = np.full(N, -1, dtype = np.int64)
+	up, = np.where(parent[tails] == indices)
+	up_code[tails[up]] = up
+
+	# From the core to the leaves, round by round (a parent peeled on the same round as its child is the root of an
+	# isolated tree, whose out-edges all have value 0)
+	bounds = np.searchsorted(layer[order], np.arange(np.max(layer, initial = -1) + 2))
+	for k in reversed(range(len(bounds) - 1)):
+		nodes = order[bounds[k]: bounds[k + 1]]
+		nodes = nodes[parent[nodes] >= 0]
+		edge_vec[up_code[nodes]] = out_sum[parent[nodes]]/eig_val
+		out_sum[nodes] = edge_vec[up_code[nodes]]
+
+	# Each eigenvector normalized as the ones returned by eigs
+	edge_vec /= np.linalg.norm(edge_vec, axis = 0)
 
-	# The non-backtracking matrix biggest eigenvalues (in module) and their associated eigenvectors
-	eig_val, eig_vec = linalg.eigs(non_backtr, k = q, which = 'LR')
-	# Indexes to sort the array of eigenvalues
-	ind = np.argsort(eig_val.real)
-	# The eigenvectors associated to the 2nd, 3rd, ..., qth biggest eigenvalues
-	real_vec = eig_vec.real[:, ind[: q - 1]]
-	
 	# The matrix used on the embedding
 	vecs = np.zeros((N, q - 1))
-	for u in adj_list.keys():
-		vecs[u - 1] = np.sum(real_vec[in_edges[u]], axis = 0)
+	np.add.at(vecs, indices, edge_vec.real)
+	return vecs
+
+
+def nb_eigenpairs(adj_list, q, cache = None, operator = 'edges', start = None):
+	"""
+	Returns the q biggest eigenvalues (in real part) of the graph's non-backtracking matrix and their associated
+	eigenvectors. If operator is 'matrix_free', the matrix is not built and the products are computed from the graph (see
+	non_backtracking_operator). If operator is 'ihara_bass', they are computed on the 2N x 2N matrix of ihara_bass
+	instead, whose eigenvectors have an entry per node (twice) instead of one per directed edge.
+	If cache (an OperatorCache) is given, they are read from it when this graph's were already computed, and so is the
+	matrix (for another q), and both are stored in it otherwise.
+	The eigensolve can be warm-started from start, an embedding of the nodes (as the one of NB_cluster) computed for a
+	closely related graph on the same nodes, which is lifted to the operator's space (see __lift) as ARPACK's starting
+	vector.
+	"""
+	if operator not in ('edges', 'matrix_free', 'ihara_bass'):
+		raise Exception("Unknown operator: " + str(operator))
+	# The names of the cache entries (both edge operators have the same eigenpairs)
+	matrix_name = 'ihara_bass' if operator == 'ihara_bass' else 'non_backtracking'
+	eigenpairs_name = ('ib_eigenpairs_' if operator == 'ihara_bass' else 'nb_eigenpairs_') + str(q)
+
+	non_backtr = None
+	if cache is not None:
+		# The edges, in the order of their codes, identify the graph and the order of the eigenvectors' entries
+		key = cache.key(np.fromiter(adj_list.keys(), dtype = np.int64, count = len(adj_list.keys())), __heads(adj_list))
+		eigenpairs = cache.load(key, eigenpairs_name)
+		if eigenpairs is not None:
+			return eigenpairs['eig_val'], eigenpairs['eig_vec']
+		if operator != 'matrix_free':
+			non_backtr = cache.load_sparse(key, matrix_name)
+
+	# The graph's non-backtracking matrix (or its Ihara-Bass counterpart)
+	if operator == 'matrix_free':
+		non_backtr = non_backtracking_operator(adj_list)
+	elif non_backtr is None:
+		non_backtr = non_backtracking_sparse(adj_list)[0] if operator == 'edges' else ihara_bass(adj_list)
+		if cache is not None:
+			cache.save_sparse(key, matrix_name, non_backtr)
+
+	v0 = None if start is None else __lift(adj_list, start, operator)
+	eig_val, eig_vec = linalg.eigs(non_backtr, k = q, which = 'LR', v0 = v0)
+	if cache is not None:
+		cache.save(key, eigenpairs_name, {'eig_val': eig_val, 'eig_vec': eig_vec})
+	return eig_val, eig_vec
+
+
+def __lift(adj_list, start, operator):
+	"""
+	Returns a vector of the operator's space approximating the sum of the (normalized) columns of the node embedding
+	start: on a non-backtracking eigenvector, an edge (u, v) is about the sum of the edges coming into v divided by the
+	degree of v, and the second half of an Ihara-Bass eigenvector (the sums of the edges going out of each node) is
+	proportional to the sum of the edges coming in divided by the degree minus one, its first half being lambda times the
+	second one (lambda being taken as the square root of the average degree)
+	"""
+	graph = CSRGraph.from_adj_list(adj_list)
+	start = np.asarray(start, dtype = float).reshape(graph.nb_nodes, -1)
+	node_vec = np.sum(start/np.linalg.norm(start, axis = 0).clip(1e-300), axis = 1)
+	if not np.any(node_vec):
+		return None
+	if operator == 'ihara_bass':
+		out_vec = node_vec/np.maximum(graph.degrees - 1, 1)
+		return np.concatenate((np.sqrt(np.mean(graph.degrees))*out_vec, out_vec))
+	return (node_vec/np.maximum(graph.degrees, 1))[graph.indices]
+
+
+def __ib_edge_values(eig_val, out_vec, tails, heads):
+	"""
+	Returns the values of the directed edges (given by their tails and heads) on the non-backtracking eigenvectors, from
+	the sums out_vec of the values of the edges going out of each node given by the Ihara-Bass eigenvectors: lambda times
+	the value of an edge (u, w) is out(w) minus the value of (w, u), so it is (lambda*out(w) - out(u))/(lambda^2 - 1)
+	"""
+	return (eig_val*out_vec[heads] - out_vec[tails])/(eig_val**2 - 1)
+
+
+def __ib_node_values(eig_val, out_vec, degrees, adj_matrix):
+	"""
+	Returns the sums of the values of the edges coming into each node on the non-backtracking eigenvectors, normalized as
+	the ones returned by eigs, from the sums out_vec of the values of the edges going out of each node given by the
+	Ihara-Bass eigenvectors (see __ib_edge_values). Since A*out = (lambda^2 + d - 1)*out/lambda on them, the sum over the
+	in-edges of a node v is (d(v) - 1)*out(v)/lambda, and the squared norm of the edge values is
+	(|lambda|^2*sum(d*|out|^2) - 2*Re(lambda*out^H*A*out) + sum(d*|out|^2))/|lambda^2 - 1|^2
+	"""
+	degrees = degrees[:, None]
+	weighted_norm = np.sum(degrees*np.abs(out_vec)**2, axis = 0)
+	cross = np.sum(np.conj(out_vec)*(adj_matrix @ out_vec), axis = 0)
+	norm = np.sqrt(np.abs(eig_val)**2*weighted_norm - 2*np.real(eig_val*cross) + weighted_norm)/np.abs(eig_val**2 - 1)
+	return ((degrees - 1)*out_vec/(eig_val*norm)).real
+
+
+def __heads(adj_list):
+	"""
+	Returns the (0-indexed) head of each directed edge, in the order of the edge codes of non_backtracking_sparse
+	"""
+	M = sum(len(adj_list[u]) for u in adj_list.keys())
+	return np.fromiter(chain.from_iterable(adj_list[u] for u in adj_list.keys()), dtype = np.int64, count = M) - 1
+
+
+def NB_cluster(N, q, adj_list, group, n, plot_graph = False, prune = False, cache = None, operator = 'edges', start = None, return_embedding = False):
+	# If prune is True, the eigenvectors are computed on the 2-core of the graph only (see pruned_embedding)
+	vecs = pruned_embedding(N, q, adj_list, cache, operator, start) if prune else None
+
+	if vecs is None:
+		# The non-backtracking matrix biggest eigenvalues (in module) and their associated eigenvectors, possibly starting
+		# from the embedding of a related graph
+		eig_val, eig_vec = nb_eigenpairs(adj_list, q, cache, operator, start)
+		# Indexes to sort the array of eigenvalues
+		ind = np.argsort(eig_val.real)
+
+		if operator == 'ihara_bass':
+			# The matrix used on the embedding, where each node sums the values of its in-edges on the eigenvectors
+			# associated to the 2nd, 3rd, ..., qth biggest eigenvalues, read from their second half without going
+			# through the edges
+			graph = CSRGraph.from_adj_list(adj_list)
+			vecs = __ib_node_values(eig_val[ind[: q - 1]], eig_vec[N:, ind[: q - 1]], graph.degrees, graph.sparse)
+		else:
+			# The eigenvectors associated to the 2nd, 3rd, ..., qth biggest eigenvalues
+			real_vec = eig_vec.real[:, ind[: q - 1]]
+
+			# The matrix used on the embedding, where each node sums the values of its in-edges
+			vecs = np.zeros((N, q - 1))
+			np.add.at(vecs, __heads(adj_list), real_vec)
 
 	# If there are only two groups
 	if q == 2:
@@ -66,7 +289,7 @@ def NB_cluster(N, q, adj_list, group, n, plot_graph = False):
 		# Clusters vecs' rows in q groups using the K-means algorithm
 		est = KMeans(n_clusters = q)
 		est.fit(vecs)
-		est_groups = est.labels_ + np.ones(N, dtype = np.int)
+		est_groups = est.labels_ + np.ones(N, dtype = int)
 
 	# The normalized overlap between the infered group assignment and the actual group assignment
 	ovlp = overlap(N, q, n, est_groups, group)
@@ -75,7 +298,7 @@ def NB_cluster(N, q, adj_list, group, n, plot_graph = False):
 	if plot_graph and q <= 4:
 		# Separates vecs' rows according to their related groups
 		x = [np.array([np.zeros(int(round(N*ni))) for ni in n]) for _ in range(q - 1)]
-		cont = np.zeros(q, dtype = np.int)
+		cont = np.zeros(q, dtype = int)
 		for i in range(N):
 			for j in range(q - 1):
 				x[j][group[i] - 1][cont[group[i] - 1]] = vecs[i, j]
@@ -106,5 +329,7 @@ def NB_cluster(N, q, adj_list, group, n, plot_graph = False):
 			ax.scatter(x[0][3], x[1][3], x[2][3], marker = 'o', c = 'y')
 			plt.show()
 
-	# Returns the calculated overlap
+	# Returns the calculated overlap (and the embedding, to warm-start the next graph of a sweep)
+	if return_embedding:
+		return ovlp, vecs
 	return ovlp
@@ -1,9 +1,13 @@
 import numpy as np
 from graph_list import Graph
-from non_backtr_list import non_backtr_cluster
+from non_backtr_list import NB_cluster
 
 
-def non_backtracking_test(N, q, c_avg, delta_min, delta_max, step, nb_instances):
+def non_backtracking_test(N, q, c_avg, delta_min, delta_max, step, nb_instances, warm_start = False, operator = 'edges'):
+	# If warm_start is True, the i-th graph of every delta is drawn with seed i, so that its nodes have the same groups for
+	# every delta, and its eigensolve starts from the embedding of the i-th graph of the previous delta
+	embeddings = [None]*nb_instances
+
 	f = open('non_backtr_results.txt', 'w')
 
 	f.write('Overlap obtained by the non-backtracking spectral algorithm on graphs with {} groups and average degree {}.'.format(q, c_avg))
@@ -15,8 +19,10 @@ def non_backtracking_test(N, q, c_avg, delta_min, delta_max, step, nb_instances)
 		edge_matrix = construct_edge_matrix(q, c_avg, delta)
 		f.write('\n\nResults for c_in = {:.3f}, c_out = {:.3f}:'.format(edge_matrix[0][0], edge_matrix[0][1]))
 		for i in range(1, nb_instances + 1):
-			g = Graph(np.copy(nb_vector), np.copy(edge_matrix)/N)
-			ovlp = non_backtr_cluster(g.nb_nodes, g.nb_groups, g.adj_list, g.group, g.group_prop)
+			g = Graph(np.copy(nb_vector), np.copy(edge_matrix)/N, seed = i if warm_start else None)
+			ovlp, embedding = NB_cluster(g.nb_nodes, g.nb_groups, g.adj_list, g.group, g.group_prop, operator = operator, start = embeddings[i - 1], return_embedding = True)
+			if warm_start:
+				embeddings[i - 1] = embedding
 			sum_ovlp += ovlp
 			f.write('\n\tOverlap from test {}:'.format(i))
 			f.write(' {:.3f}'.format(ovlp))
@@ -0,0 +1,115 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class OperatorCache:
+	def __init__(self, directory, max_bytes = 2**30):
+		"""
+		An on-disk cache of the operators and eigenpairs derived from a graph, so that repeated analyses of the same graph
+		(for several numbers of groups or clustering seeds) skip their construction and eigensolves.
+		Each entry is a set of named arrays, stored as .npy files (read back memory-mapped) under the directory
+		key/name, where key is a hash of the graph's edge arrays and name says what was derived from them. When the entries
+		take more than max_bytes, the least recently used ones are removed.
+
+		Attributes:
+		-----------------
+		directory: str
+			The directory holding the entries
+		max_bytes: int
+			The maximum total size of the entries
+		"""
+		self.directory = directory
+		self.max_bytes = max_bytes
+		os.makedirs(directory, exist_ok = True)
+
+
+	@staticmethod
+	def key(*arrays):
+		"""
+		Returns the hash (SHA-256) of the contents, types and shapes of the given arrays
+		"""
+		digest = hashlib.sha256()
+		for array in arrays:
+			array = np.ascontiguousarray(array)
+			digest.update(str((array.dtype.str, array.shape)).encode())
+			digest.update(array.data)
+		return digest.hexdigest()
+
+
+	def load(self, key, name):
+		"""
+		Returns the dictionary of memory-mapped arrays of the entry (key, name), or None if there is no such entry
+		"""
+		path = os.path.join(self.directory, key, name)
+		if not os.path.isdir(path):
+			return None
+		# The entry is now the most recently used
+		os.utime(path)
+		return {file[: -4]: np.load(os.path.join(path, file), mmap_mode = 'r') for file in os.listdir(path) if file.endswith('.npy')}
+
+
+	def save(self, key, name, arrays):
+		"""
+		Stores the dictionary of arrays as the entry (key, name), and removes the least recently used entries if the cache
+		gets too big
+		"""
+		path = os.path.join(self.directory, key, name)
+		# The entry is written to a temporary directory first, so that an entry is never read half-written
+		temporary = path + '.tmp' + str(os.getpid())
+		os.makedirs(temporary, exist_ok = True)
+		for array_name, array in arrays.items():
+			np.save(os.path.join(temporary, array_name + '.npy'), np.asarray(array))
+		if os.path.isdir(path):
+			shutil.rmtree(path)
+		os.replace(temporary, path)
+		self.__evict()
+
+
+	def load_sparse(self, key, name):
+		"""
+		Returns the sparse matrix stored as the entry (key, name) (sharing the memory-mapped arrays), or None
+		"""
+		arrays = self.load(key, name)
+		if arrays is None:
+			return None
+		return csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape = tuple(arrays['shape']))
+
+
+	def save_sparse(self, key, name, matrix):
+		"""
+		Stores a sparse matrix as the entry (key, name)
+		"""
+		matrix = csr_matrix(matrix)
+		self.save(key, name, {'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr, 'shape': np.array(matrix.shape)})
+
+
+	def __evict(self):
+		"""
+		Removes the least recently used entries until the entries take at most max_bytes
+		"""
+		entries = []
+		for key in os.listdir(self.directory):
+			key_path = os.path.join(self.directory, key)
+			if not os.path.isdir(key_path):
+				continue
+			for name in os.listdir(key_path):
+				path = os.path.join(key_path, name)
+				if '.tmp' in name or not os.path.isdir(path):
+					continue
+				size = sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+				entries.append((os.path.getmtime(path), size, path))
+
+		# From the least recently used
+		entries.sort()
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in entries:
+			if total <= self.max_bytes:
+				break
+			shutil.rmtree(path, ignore_errors = True)
+			total -= size
+			# Removes the graph's directory once it has no entries left
+			if not os.listdir(os.path.dirname(path)):
+				os.rmdir(os.path.dirname(path))
@@ -1,10 +1,17 @@
 import numpy as np
+from graph_file import is_graph_file, read_graph
 
 
 def read_file(file):
 	"""
-	Reads and returns the graph's data written on a file
+	Reads and returns the graph's data written on a file (as text by write_in_file, or as a binary graph file whose
+	arrays are memory-mapped)
 	"""
+	if is_graph_file(file):
+		# The graph's CSRGraph is used as its adjacency list
+		N, q, adj_list, group, n, c = read_graph(file)
+		return N, q, adj_list, group, n, c
+
 	# File where the graph data is writen
 	f = open(file, 'r')
 
@@ -0,0 +1,170 @@
+import os
+import numpy as np
+import pytest
+from BP_flood import BP_flood_batch, BP_Inference_batch, BP_Inference_flood
+from BP_learn import BP_learning, BP_learning_batch
+from BP_infer import BP_Inference
+from belief_propagation import infer_assignment_batch, learn_parameters_batch
+
+
+N_GROUP = np.array([.5, .5])
+C_GROUP = np.array([[18., 3.], [3., 18.]])
+
+
+def csr_arrays(graph):
+	return graph.indptr, graph.indices, graph.reverse
+
+
+def start(csr, nb_restarts = 2):
+	messages = np.random.default_rng(0).random((nb_restarts, len(csr[1]), 2))
+	return messages/np.sum(messages, axis = 2, keepdims = True)
+
+
+def test_flood_matches_BP_Inference(sbm_graph, agreement):
+	# Both schedules reach the same assignment and, up to the incremental updates of BP_Inference's external field, the
+	# same free energy
+	adj_list, group = sbm_graph()
+	np.random.seed(0)
+	expected = BP_Inference(2, N_GROUP, C_GROUP, adj_list, 1e-8, 200)
+	result = BP_Inference_flood(2, N_GROUP, C_GROUP, adj_list, 1e-8, 500)
+	assert np.isclose(result[3], expected[3], atol = 1e-2)
+	assert agreement(result[2], expected[2]) > 0.95
+
+
+@pytest.mark.parametrize('log_domain', [False, True])
+def test_storage_matches_memory(tmp_path, sbm_graph, log_domain):
+	# The edges are swept by chunks of about 100 edges through the memory-mapped arrays
+	csr = csr_arrays(sbm_graph()[0])
+	expected = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-6, 30, 2, init_messages = start(csr), return_state = True, log_domain = log_domain)
+	result = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-6, 30, 2, init_messages = start(csr), return_state = True, log_domain = log_domain, storage = str(tmp_path), chunk_size = 100)
+
+	for value, expected_value in zip(result[: 4], expected[: 4]):
+		assert np.allclose(value, expected_value)
+	messages = np.exp(result[4]) if log_domain else result[4]
+	assert np.allclose(messages, expected[4])
+	# The scratch files of the run are removed
+	assert sorted(os.listdir(str(tmp_path))) == ['marginals.npy', 'messages.npy', 'state.npz']
+
+
+def test_finished_run_is_not_resumed(tmp_path, sbm_graph):
+	csr = csr_arrays(sbm_graph()[0])
+	BP_flood_batch(2, N_GROUP, C_GROUP, csr, 0, 3, 2, init_messages = start(csr), storage = str(tmp_path))
+	state = np.load(os.path.join(str(tmp_path), 'state.npz'))
+	assert int(state['t']) == 3 and bool(state['done'])
+
+	# A new run starts from its own initial messages
+	expected = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 0, 3, 2, init_messages = start(csr)[:, :, ::-1])
+	result = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 0, 3, 2, init_messages = start(csr)[:, :, ::-1], storage = str(tmp_path))
+	for value, expected_value in zip(result, expected):
+		assert np.allclose(value, expected_value)
+
+
+@pytest.mark.parametrize('dtype, log_domain', [(np.float32, False), (float, True), (np.float32, True)])
+def test_precision_matches_float64(sbm_graph, dtype, log_domain):
+	# The messages stored as float32 or as their logs give the fixed point of the float64 run
+	csr = csr_arrays(sbm_graph()[0])
+	expected = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-6, 30, 2, init_messages = start(csr), return_state = True)
+	result = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-6, 30, 2, init_messages = start(csr), return_state = True, dtype = dtype, log_domain = log_domain)
+	assert result[4].dtype == np.dtype(dtype)
+	for value, expected_value in zip(result, expected):
+		assert np.allclose(value, expected_value, atol = 1e-4)
+
+
+@pytest.mark.parametrize('log_domain', [False, True])
+def test_one_hot_messages_with_zero_affinities_stay_finite(sbm_graph, log_domain):
+	# c times a one-hot message has zero entries, whose logs were -inf and gave NaN once removed from the node products
+	graph, group = sbm_graph((40, 40, 40), .2, .02, seed = 6)
+	csr = csr_arrays(graph)
+	n, c = np.full(3, 1/3), np.array([[30., 3., 0.], [3., 30., 3.], [0., 3., 30.]])
+	messages = np.eye(3)[np.random.default_rng(1).integers(3, size = (2, len(graph.indices)))]
+	expected = BP_flood_batch(3, n, c, csr, 1e-6, 5, 2, init_messages = messages, return_state = True)
+	result = BP_flood_batch(3, n, c, csr, 1e-6, 5, 2, init_messages = messages, return_state = True, log_domain = log_domain)
+	assert np.all(np.isfinite(result[3])) and np.all(np.isfinite(result[4]))
+	for value, expected_value in zip(result, expected):
+		assert np.allclose(value, expected_value)
+
+
+def interrupted(csr, storage):
+	# Saves 3 steps and marks the saved state as the one of an interrupted run
+	BP_flood_batch(2, N_GROUP, C_GROUP, csr, 0, 3, 2, init_messages = start(csr), storage = storage)
+	path = os.path.join(storage, 'state.npz')
+	np.savez(path, **dict(np.load(path), done = False))
+
+
+@pytest.mark.parametrize('c, damping, c_structure, resumed', [(C_GROUP, 0.5, None, True), (C_GROUP + 1, 0.5, None, False), (C_GROUP, 0.3, None, False), (C_GROUP, 0.5, 'dense', False)])
+def test_interrupted_run_is_resumed_with_same_parameters(tmp_path, sbm_graph, c, damping, c_structure, resumed):
+	# The run is taken to 6 steps from the saved state (ignoring the new initial messages), but another affinity matrix,
+	# damping or structure of the affinity matrix starts a new run
+	csr = csr_arrays(sbm_graph()[0])
+	interrupted(csr, str(tmp_path))
+	new_start = start(csr)[:, :, ::-1]
+	expected = BP_flood_batch(2, N_GROUP, c, csr, 0, 6, 2, damping, init_messages = start(csr) if resumed else new_start, c_structure = c_structure)
+	result = BP_flood_batch(2, N_GROUP, c, csr, 0, 6, 2, damping, init_messages = new_start, c_structure = c_structure, storage = str(tmp_path))
+	for value, expected_value in zip(result, expected):
+		assert np.allclose(value, expected_value)
+
+
+def test_learning_warm_starts_flood_inference(sbm_graph):
+	# Each EM step of BP_learning starts from the messages of the previous one, damping keeping its original position
+	adj_list, group = sbm_graph()
+	np.random.seed(0)
+	groups, f_BP = BP_learning(2, N_GROUP, 0.8*C_GROUP, adj_list, 1e-4, 0, 20, 2, BP_Inference_flood)
+
+	np.random.seed(0)
+	n, c, _, _, messages, _ = BP_Inference_flood(2, N_GROUP, 0.8*C_GROUP, adj_list, 1e-4, 20, 0.5, None, True)
+	expected = BP_Inference_flood(2, n, c, adj_list, 1e-4, 20, 0.5, messages)
+	assert np.array_equal(groups, expected[2])
+	assert np.isclose(f_BP, expected[3])
+
+
+def test_batch_matches_single_runs(sbm_graph):
+	# The restarts of a batch start from the messages of R consecutive random draws, as R single runs
+	adj_list, group = sbm_graph()
+	np.random.seed(0)
+	est_prop, est_edges, groups, f_min, f_BP = BP_Inference_batch(2, N_GROUP, C_GROUP, adj_list, 1e-6, 200, 4)
+	np.random.seed(0)
+	expected = [BP_Inference_flood(2, N_GROUP, C_GROUP, adj_list, 1e-6, 200) for _ in range(4)]
+	assert np.allclose(f_BP, [result[3] for result in expected])
+	best = expected[np.argmin(f_BP)]
+	assert np.allclose(est_prop, best[0]) and np.allclose(est_edges, best[1]) and np.array_equal(groups, best[2])
+	assert f_min == np.min(f_BP)
+
+
+def test_converged_restart_stops_updating(sbm_graph):
+	# The first restart starts near its fixed point and converges after a few steps, the second one from random messages
+	csr = csr_arrays(sbm_graph()[0])
+	messages = start(csr)
+	messages[0] = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 0, 8, 1, init_messages = messages[:1], return_state = True)[4][0]
+	result = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-2, 200, 2, init_messages = messages, return_state = True)
+	for r in range(2):
+		expected = BP_flood_batch(2, N_GROUP, C_GROUP, csr, 1e-2, 200, 1, init_messages = messages[r : r + 1], return_state = True)
+		for value, expected_value in zip(result, expected):
+			assert np.allclose(value[r], expected_value[0], rtol = 0, atol = 1e-12)
+
+
+def test_learning_batch_matches_single_runs(sbm_graph):
+	adj_list, group = sbm_graph()
+	n_init = np.array([[.5, .5], [.4, .6], [.6, .4]])
+	c_init = np.array([0.8*C_GROUP, 1.2*C_GROUP, C_GROUP])
+	np.random.seed(0)
+	groups, f_BP = BP_learning_batch(2, n_init, c_init, adj_list, 1e-4, 1e-3, 30, 5)
+	np.random.seed(0)
+	for r in range(3):
+		expected_groups, expected_f = BP_learning(2, n_init[r], c_init[r], adj_list, 1e-4, 1e-3, 30, 5, BP_Inference_flood)
+		assert np.array_equal(groups[r], expected_groups) and np.isclose(f_BP[r], expected_f)
+
+
+def test_batch_wrappers_keep_the_best_restart(sbm_graph):
+	adj_list, group = sbm_graph()
+	np.random.seed(0)
+	ovlp, f_min, f_BP = infer_assignment_batch(300, 2, adj_list, group, N_GROUP, C_GROUP, 1e-6, 200, 4)
+	assert ovlp > 0.8 and f_min == np.min(f_BP) and len(f_BP) == 4
+
+	np.random.seed(0)
+	groups, f_BP = learn_parameters_batch(adj_list, 2, 25, 4)
+	np.random.seed(0)
+	n, c = np.random.rand(4, 2), np.random.rand(4, 2, 2)
+	n /= np.sum(n, axis = 1, keepdims = True)
+	c = 25*(np.triu(c) + np.swapaxes(np.triu(c, 1), 1, 2))
+	expected_groups, expected_f = BP_learning_batch(2, n, c, adj_list, 0.2, 0.2, 12, 8)
+	assert np.allclose(f_BP, expected_f, equal_nan = True) and np.array_equal(groups, expected_groups[np.argmin(expected_f)])
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from BP_infer import BP_Inference, free_energy_edges
+from BP_flood import BP_Inference_flood
+from BP_learn import BP_learning, BP_learning_batch
+
+
+def test_free_energy_of_unnormalized_messages_does_not_depend_on_structure(sbm_graph):
+	# A planted affinity matrix, whose product by the messages uses their sums
+	graph, group = sbm_graph((40, 40, 40), .2, .02, seed = 6)
+	c = np.full((3, 3), 3.) + 21*np.eye(3)
+	messages = np.random.default_rng(0).random((len(graph.indices), 3))
+	n = np.full(3, 1/3)
+	expected = free_energy_edges(120, n, c, None, messages, graph.tails, graph.reverse, 'dense')
+	result = free_energy_edges(120, n, c, None, messages, graph.tails, graph.reverse, 'planted')
+	assert np.isclose(result[0], expected[0])
+	assert np.allclose(result[1], expected[1])
+
+
+def test_one_hot_messages_with_zero_affinities_stay_finite(sbm_graph):
+	# c times a one-hot message has zero entries, whose logs were -inf and gave NaN once removed from their sums
+	graph, group = sbm_graph((40, 40, 40), .2, .02, seed = 6)
+	c = np.array([[30., 3., 0.], [3., 30., 3.], [0., 3., 30.]])
+	messages = np.eye(3)[np.random.default_rng(1).integers(3, size = len(graph.indices))]
+	np.random.seed(0)
+	est_prop, est_edges, groups, f_BP, messages, h = BP_Inference(3, np.full(3, 1/3), c, graph, 1e-6, 5, messages, True)
+	assert np.all(np.isfinite(messages)) and np.allclose(np.sum(messages, axis = 1), 1)
+	assert np.isfinite(f_BP) and np.all(np.isfinite(est_edges))
+
+
+@pytest.mark.filterwarnings('error')
+@pytest.mark.parametrize('inference', [BP_Inference, BP_Inference_flood])
+def test_vanishing_group_stays_finite(sbm_graph, inference):
+	# A group without nodes gave log(0) and 0/0 in the free energy and the edge matrix, which fed NaN into the next EM step
+	adj_list, group = sbm_graph()
+	n, c = np.array([1., 0.]), np.array([[18., 3.], [3., 18.]])
+	np.random.seed(0)
+	est_prop, est_edges, groups, f_BP = inference(2, n, c, adj_list, 1e-4, 30)
+	assert np.isfinite(f_BP) and np.all(np.isfinite(est_edges)) and np.all(est_edges[1] == 0)
+	np.random.seed(0)
+	groups, f_BP = BP_learning(2, n, c, adj_list, 1e-4, 1e-3, 30, 5, inference)
+	assert np.isfinite(f_BP)
+	np.random.seed(0)
+	groups, f_BP = BP_learning_batch(2, np.array([n, [.5, .5]]), np.array([c, c]), adj_list, 1e-4, 1e-3, 30, 5)
+	assert np.all(np.isfinite(f_BP))
+
+
+def reference_sweeps(q, n, c, adj_list, t_max, messages):
+	# The update of BP_Inference taking the product over the other neighbors k of u of c times the messages (k, u), in
+	# O(deg^2) per node, with the same random order of the messages
+	N = len(adj_list)
+	code_to_edge = [(u, v) for u, neighbors in adj_list.items() for v in neighbors]
+	edge_to_code = {edge: code for code, edge in enumerate(code_to_edge)}
+	messages = messages/np.sum(messages, axis = 1, keepdims = True)
+
+	marg_prob = np.zeros((N, q))
+	for u, neighbors in adj_list.items():
+		for v in neighbors:
+			marg_prob[u - 1] += np.dot(c, messages[edge_to_code[(v, u)]])*messages[edge_to_code[(u, v)]]
+		if len(neighbors) == 0:
+			marg_prob[u - 1] = 1
+		marg_prob[u - 1] /= np.sum(marg_prob[u - 1])
+	h = np.dot(c, np.sum(marg_prob, axis = 0))/N
+
+	for t in range(t_max):
+		for i in np.random.permutation(len(code_to_edge)):
+			u, v = code_to_edge[i]
+			old_message = np.copy(messages[i])
+			prod = np.ones(q)
+			for k in adj_list[u]:
+				if k != v:
+					prod *= np.dot(c, messages[edge_to_code[(k, u)]])
+			messages[i] = n*np.exp(-h)*prod
+			messages[i] /= np.sum(messages[i])
+
+			old_marg_prob = np.copy(marg_prob[v - 1])
+			marg_prob[v - 1] *= np.dot(c, messages[i])/np.dot(c, old_message)
+			marg_prob[v - 1] /= np.sum(marg_prob[v - 1])
+			h += np.dot(c, marg_prob[v - 1] - old_marg_prob)/N
+	return messages, h
+
+
+def test_matches_reference_products(sbm_graph):
+	# The cavity products obtained by removing a message from the node's product give the same sweeps
+	adj_list, group = sbm_graph((60, 60), .15, .03, seed = 2)
+	n, c = np.array([.4, .6]), np.array([[15., 3.], [3., 12.]])
+	init_messages = np.random.default_rng(0).random((len(adj_list.indices), 2))
+	np.random.seed(0)
+	expected = reference_sweeps(2, n, c, adj_list, 5, init_messages)
+	np.random.seed(0)
+	result = BP_Inference(2, n, c, adj_list, 0, 5, init_messages, True)
+	assert np.allclose(result[4], expected[0], rtol = 0, atol = 1e-10)
+	assert np.allclose(result[5], expected[1], rtol = 0, atol = 1e-10)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from BP_infer import BP_Inference
+from BP_flood import BP_Inference_flood
+from BP_parallel import run_restarts, run_learning
+
+
+N_GROUP = np.array([.5, .5])
+C_GROUP = np.array([[18., 3.6], [3.6, 18.]])
+
+
+@pytest.mark.parametrize('inference', [BP_Inference, BP_Inference_flood])
+def test_restarts_do_not_depend_on_jobs(sbm_graph, inference):
+	# The workers read the graph from shared memory
+	args = (2, N_GROUP, C_GROUP, sbm_graph((60, 60), .15, .03, seed = 5)[0], 1e-4, 20, inference, 3)
+	for (groups, f_BP), (expected_groups, expected_f_BP) in zip(run_restarts(*args, n_jobs = 2, seed = 7), run_restarts(*args, n_jobs = 1, seed = 7)):
+		assert np.array_equal(groups, expected_groups)
+		assert np.isclose(f_BP, expected_f_BP)
+
+
+def test_learning_does_not_depend_on_jobs(sbm_graph):
+	args = (2, 20, sbm_graph((60, 60), .15, .03, seed = 5)[0], 0.2, 0.2, 12, 4, BP_Inference_flood, 2)
+	for (groups, f_BP), (expected_groups, expected_f_BP) in zip(run_learning(*args, n_jobs = 2, seed = 7), run_learning(*args, n_jobs = 1, seed = 7)):
+		assert np.array_equal(groups, expected_groups)
+		assert np.isclose(f_BP, expected_f_BP)
+
+
+def test_zero_jobs_is_rejected(sbm_graph):
+	with pytest.raises(Exception):
+		run_restarts(2, N_GROUP, C_GROUP, sbm_graph((60, 60), .15, .03, seed = 5)[0], 1e-4, 20, BP_Inference_flood, 3, n_jobs = 0)
+
+
+def test_tasks_on_this_process_keep_the_random_state(sbm_graph):
+	# The tasks seed the global random state of the process they run on
+	np.random.seed(3)
+	expected = np.random.rand(3)
+	np.random.seed(3)
+	run_restarts(2, N_GROUP, C_GROUP, sbm_graph((60, 60), .15, .03, seed = 5)[0], 1e-4, 20, BP_Inference_flood, 2, n_jobs = 1, seed = 7)
+	run_learning(2, 20, sbm_graph((60, 60), .15, .03, seed = 5)[0], 0.2, 0.2, 12, 4, BP_Inference_flood, 2, n_jobs = 1, seed = 7)
+	assert np.array_equal(np.random.rand(3), expected)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import time
+from BP_flood import BP_Inference_flood
+from BP_pruned import BP_Inference_pruned
+from graph_list import Graph
+from two_core import two_core
+
+
+@pytest.mark.parametrize('seed', [5, 6])
+def test_pruned_matches_flood(seed):
+	# A sparse graph with a large tree fringe (about a fifth of its nodes), whose messages are rebuilt around the core
+	graph = Graph(np.array([200, 200]), np.array([[.015, .001], [.001, .015]]), seed = seed)
+	assert np.mean(two_core(graph.graph.indptr, graph.graph.indices)[0] >= 0) > .15
+	n, c = graph.group_prop, graph.edge_prop*graph.nb_nodes
+	messages = np.random.default_rng(0).random((len(graph.graph.indices), 2))
+	messages /= np.sum(messages, axis = 1, keepdims = True)
+	expected = BP_Inference_flood(2, n, c, graph.adj_list, 1e-8, 3000, init_messages = messages, return_state = True)
+	result = BP_Inference_pruned(2, n, c, graph.adj_list, 1e-8, 3000, init_messages = messages, return_state = True)
+	assert np.array_equal(result[2], expected[2])
+	for k in (0, 1, 3, 4, 5):
+		assert np.allclose(result[k], expected[k], rtol = 0, atol = 1e-5)
+
+
+def test_forest_matches_flood():
+	# Without a core, the messages are only given by the passes over the trees
+	adj_list = {1: [2], 2: [1, 3, 4], 3: [2], 4: [2, 5], 5: [4, 6], 6: [5], 7: [8], 8: [7]}
+	n, c = np.array([.5, .5]), np.array([[3., 1.], [1., 3.]])
+	expected = BP_Inference_flood(2, n, c, adj_list, 1e-12, 3000, return_state = True)
+	result = BP_Inference_pruned(2, n, c, adj_list, 1e-12, 3000, return_state = True)
+	for k in (0, 1, 3, 4, 5):
+		assert np.allclose(result[k], expected[k], rtol = 0, atol = 1e-8)
+
+
+def grafted_graph(N_core, N_trees, seed):
+	# A core SBM graph on which random recursive trees are grafted: each new node joins a uniformly random earlier node
+	graph = Graph(np.array([N_core//2, N_core//2]), np.array([[8., 2.], [2., 8.]])/N_core, seed = seed)
+	adj_list = {u: list(neighbors) for u, neighbors in graph.adj_list.items()}
+	rng = np.random.default_rng(seed)
+	for u in range(N_core + 1, N_core + N_trees + 1):
+		v = int(rng.integers(1, u))
+		adj_list[u] = [v]
+		adj_list[v].append(u)
+	return adj_list
+
+
+def test_grafted_trees_match_flood():
+	# With strong communities several fixed points exist, and the trees do not start from the same messages on both
+	# schedules: the result must be a fixed point of the flooding schedule
+	adj_list = grafted_graph(400, 1200, 2)
+	n, c = np.array([.5, .5]), np.array([[8., 2.], [2., 8.]])
+	result = BP_Inference_pruned(2, n, c, adj_list, 1e-10, 3000, return_state = True)
+	expected = BP_Inference_flood(2, n, c, adj_list, 1e-10, 3000, init_messages = result[4], return_state = True)
+	for k in (0, 1, 3, 4, 5):
+		assert np.allclose(result[k], expected[k], rtol = 0, atol = 1e-7)
+
+
+def test_cost_decreases_with_fringe():
+	# The time of a fixed number of steps relative to the flooding schedule, which updates the edges of the trees as well
+	n, c = np.array([.5, .5]), np.array([[8., 2.], [2., 8.]])
+
+	def ratio(adj_list):
+		# The two schedules are timed in turns, so that a slowdown of the machine affects both, and the best of five
+		# times is kept
+		times = {BP_Inference_pruned: [], BP_Inference_flood: []}
+		for _ in range(5):
+			for function in times:
+				start = time.perf_counter()
+				function(2, n, c, adj_list, 0, 30)
+				times[function].append(time.perf_counter() - start)
+		return min(times[BP_Inference_pruned])/min(times[BP_Inference_flood])
+
+	ratios = [ratio(grafted_graph(8000, N_trees, 1)) for N_trees in (0, 24000)]
+	assert ratios[1] < .8 and ratios[1] < ratios[0]
@@ -0,0 +1,60 @@
+import numpy as np
+from BP_infer import BP_Inference
+from BP_flood import BP_Inference_flood
+from BP_residual import BP_Inference_residual
+from graph_list import Graph
+
+
+def test_residual_matches_BP_Inference(sbm_graph, agreement):
+	graph, group = sbm_graph()
+	n, c = np.array([.5, .5]), np.array([[18., 3.], [3., 18.]])
+	np.random.seed(0)
+	expected = BP_Inference(2, n, c, graph, 1e-8, 200)
+	result = BP_Inference_residual(2, n, c, graph, 1e-8, 500)
+	assert np.isclose(result[3], expected[3], atol = 1e-2)
+	assert agreement(result[2], expected[2]) > 0.95
+
+
+def test_one_hot_messages_with_zero_affinities_stay_finite(sbm_graph):
+	# c times a one-hot message has a zero entry, whose log was -inf and gave NaN once removed from the products
+	graph, group = sbm_graph()
+	n, c = np.array([.5, .5]), np.array([[8., 0.], [0., 8.]])
+	messages = np.eye(2)[np.random.default_rng(1).integers(2, size = len(graph.indices))]
+	np.random.seed(0)
+	expected = BP_Inference(2, n, c, graph, 1e-6, 5, messages, True)
+	result = BP_Inference_residual(2, n, c, graph, 1e-6, 5, messages, True)
+	assert np.all(np.isfinite(result[4])) and np.allclose(np.sum(result[4], axis = 1), 1)
+	assert np.isfinite(result[3]) and np.all(np.isfinite(result[1]))
+	assert np.allclose(result[4], expected[4], rtol = 0, atol = 1e-10)
+	# BP_Inference leaves h out of date with its marginals on these messages, so the free energy is that of flooding
+	expected = BP_Inference_flood(2, n, c, graph, 1e-10, 100, init_messages = result[4], return_state = True)
+	assert np.isclose(result[3], expected[3], rtol = 0, atol = 1e-8)
+	assert np.allclose(result[5], expected[5], rtol = 0, atol = 1e-8)
+
+
+def test_field_matches_marginals(agreement):
+	# The field h was computed before the marginals it gives, and the residual schedule converged to a fixed point with
+	# every node in one group
+	graph = Graph(np.array([150, 150]), np.array([[.06, .01], [.01, .06]]), seed = 1)
+	n, c = graph.group_prop, graph.edge_prop*graph.nb_nodes
+	for seed in range(3):
+		np.random.seed(seed)
+		expected = BP_Inference(2, n, c, graph.adj_list, 1e-8, 200)
+		np.random.seed(seed)
+		result = BP_Inference_residual(2, n, c, graph.adj_list, 1e-8, 500, return_state = True)
+		assert np.allclose(result[5], c.dot(result[0]))
+		assert np.allclose(np.sort(result[0]), np.sort(expected[0]), atol = .03)
+		assert np.isclose(result[3], expected[3], atol = .03)
+		assert agreement(result[2], expected[2]) > .95
+
+
+def test_stops_at_a_fixed_point():
+	# Every update changes h, which the residuals of the messages not going out of the updated head missed, so that the
+	# queue could run empty away from a fixed point
+	graph = Graph(np.array([150, 150]), np.array([[.06, .01], [.01, .06]]), seed = 1)
+	n, c = graph.group_prop, graph.edge_prop*graph.nb_nodes
+	np.random.seed(0)
+	result = BP_Inference_residual(2, n, c, graph.adj_list, 1e-8, 500, return_state = True)
+	expected = BP_Inference_flood(2, n, c, graph.adj_list, 1e-10, 100, init_messages = result[4], return_state = True)
+	for k in (0, 1, 3, 4, 5):
+		assert np.allclose(result[k], expected[k], rtol = 0, atol = 1e-7)
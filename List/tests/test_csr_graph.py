@@ -0,0 +1,49 @@
+import numpy as np
+from csr_graph import CSRGraph
+
+
+# A triangle 1-2-3 with a tail 3-4, node 5 and node 7 isolated, the edge 6-8, and neighbors not listed in order
+ADJ_LIST = {1: [3, 2], 2: [1, 3], 3: [4, 1, 2], 4: [3], 5: [], 6: [8], 7: [], 8: [6]}
+
+
+def test_views_match_adjacency_list():
+	graph = CSRGraph.from_adj_list(ADJ_LIST)
+	N = len(ADJ_LIST)
+	assert graph.nb_nodes == len(graph) == N
+	assert graph.degrees.tolist() == [len(ADJ_LIST[u]) for u in range(1, N + 1)]
+
+	# The edges of each node are its CSR segment, in the order of the adjacency list
+	edges = [(u - 1, v - 1) for u in range(1, N + 1) for v in ADJ_LIST[u]]
+	assert list(zip(graph.tails.tolist(), graph.indices.tolist())) == edges
+	assert graph.row_col[0] is graph.tails and graph.row_col[1] is graph.indices
+	# The reverse of each edge
+	assert [edges[e] for e in graph.reverse] == [(v, u) for u, v in edges]
+
+	# The adjacency list, with the isolated nodes, and the dict interface
+	assert graph.adj_list == ADJ_LIST
+	assert list(graph.keys()) == list(graph) == list(ADJ_LIST)
+	assert [graph[u] for u in graph] == list(graph.values()) == list(ADJ_LIST.values())
+	assert dict(graph.items()) == ADJ_LIST
+
+	# The adjacency matrices
+	adj_matrix = np.zeros((N, N), dtype = np.int8)
+	for u, v in edges:
+		adj_matrix[u, v] = 1
+	assert np.array_equal(graph.adj_matrix, adj_matrix)
+	assert np.array_equal(graph.sparse.toarray(), adj_matrix) and graph.sparse.shape == (N, N)
+	assert graph.sparse.indices is graph.indices
+
+
+def test_views_are_built_once():
+	graph = CSRGraph.from_adj_list(ADJ_LIST)
+	assert graph.tails is graph.tails and graph.reverse is graph.reverse and graph.adj_list is graph.adj_list
+	assert CSRGraph.from_adj_list(graph) is graph
+
+
+def test_constructors_give_the_same_graph():
+	graph = CSRGraph.from_adj_list(ADJ_LIST)
+	# The same edges, with the neighbors of each node in another order (reversed, or sorted)
+	for other in (CSRGraph.from_row_col(graph.nb_nodes, graph.tails[::-1], graph.indices[::-1]), CSRGraph.from_matrix(graph.adj_matrix)):
+		assert np.array_equal(other.indptr, graph.indptr)
+		assert np.array_equal(other.adj_matrix, graph.adj_matrix)
+		assert {u: sorted(neighbors) for u, neighbors in other.items()} == {u: sorted(neighbors) for u, neighbors in ADJ_LIST.items()}
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from edge_list import read_edge_list
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 10])
+def test_string_ids_are_numbered_in_order_of_appearance(tmp_path, chunk_size):
+	path = tmp_path / 'graph.txt'
+	path.write_text('# comment\nzeta alpha\nmu alpha\nalpha zeta\nbeta beta\nbeta mu\n')
+	graph, ids = read_edge_list(str(path), chunk_size = chunk_size, numeric_ids = False)
+
+	assert ids.tolist() == ['zeta', 'alpha', 'mu', 'beta']
+	assert graph.adj_list == {1: [2], 2: [1, 3], 3: [2, 4], 4: [3]}
+
+
+def test_numeric_ids_are_numbered_in_order(tmp_path):
+	path = tmp_path / 'graph.csv'
+	path.write_text('30,10,0.5\n20,10,1\n10,30,2\n')
+	graph, ids = read_edge_list(str(path), delimiter = ',')
+
+	assert ids.tolist() == [10, 20, 30]
+	assert graph.adj_list == {1: [2, 3], 2: [1], 3: [1]}
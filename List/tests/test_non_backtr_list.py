@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy.linalg import subspace_angles
+from non_backtr_list import NB_cluster
+
+
+def cosine(x, y):
+	return abs(np.dot(x.ravel(), y.ravel()))/(np.linalg.norm(x)*np.linalg.norm(y))
+
+
+@pytest.mark.parametrize('operator', ['edges', 'matrix_free', 'ihara_bass'])
+def test_warm_start_gives_the_same_embedding(sbm_graph, operator):
+	# Starting from the embedding of a previous run
+	adj_list, group = sbm_graph(p_in = .05, seed = 10)
+	n = np.array([.5, .5])
+	ovlp, vecs = NB_cluster(300, 2, adj_list, group, n, operator = operator, return_embedding = True)
+	warm_ovlp, warm_vecs = NB_cluster(300, 2, adj_list, group, n, operator = operator, start = vecs, return_embedding = True)
+	assert np.isclose(warm_ovlp, ovlp)
+	assert cosine(warm_vecs, vecs) > 1 - 1e-6
+
+
+@pytest.mark.parametrize('q, p_in, p_out', [(2, .05, .01), (3, .08, .015)])
+def test_operators_give_the_same_embedding(sbm_graph, q, p_in, p_out):
+	adj_list, group = sbm_graph((300//q,)*q, p_in, p_out, seed = 10)
+	n = np.ones(q)/q
+	np.random.seed(0)
+	ovlp, vecs = NB_cluster(300, q, adj_list, group, n, return_embedding = True)
+	assert ovlp > 0.5
+	for operator in ('matrix_free', 'ihara_bass'):
+		for prune in (False, True):
+			np.random.seed(0)
+			other_ovlp, other_vecs = NB_cluster(300, q, adj_list, group, n, prune = prune, operator = operator, return_embedding = True)
+			assert np.isclose(other_ovlp, ovlp)
+			# The eigenvectors span the same space and have the same scale on it
+			assert np.max(subspace_angles(other_vecs, vecs)) < 1e-6
+			assert np.allclose(np.linalg.norm(other_vecs, axis = 0), np.linalg.norm(vecs, axis = 0))
+
+
+@pytest.mark.parametrize('operator', ['edges', 'matrix_free', 'ihara_bass'])
+def test_pruning_gives_the_same_embedding(sbm_graph, operator):
+	adj_list, group = sbm_graph(p_in = .05, seed = 10)
+	n = np.array([.5, .5])
+	ovlp, vecs = NB_cluster(300, 2, adj_list, group, n, return_embedding = True)
+	pruned_ovlp, pruned_vecs = NB_cluster(300, 2, adj_list, group, n, prune = True, operator = operator, return_embedding = True)
+	assert np.isclose(pruned_ovlp, ovlp)
+	assert cosine(pruned_vecs, vecs) > 1 - 1e-6
+	# Starting from the pruned embedding
+	warm_ovlp, warm_vecs = NB_cluster(300, 2, adj_list, group, n, prune = True, operator = operator, start = pruned_vecs, return_embedding = True)
+	assert np.isclose(warm_ovlp, ovlp)
+	assert cosine(warm_vecs, pruned_vecs) > 1 - 1e-6
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from csr_graph import CSRGraph
+from two_core import two_core
+
+
+def peel(adj_list):
+	graph = CSRGraph.from_adj_list(adj_list)
+	return two_core(graph.indptr, graph.indices)
+
+
+def test_path():
+	# The ends are peeled first, and the middle edge is an isolated tree rooted at its biggest node
+	layer, parent, order = peel({1: [2], 2: [1, 3], 3: [2, 4], 4: [3]})
+	assert layer.tolist() == [0, 1, 1, 0]
+	assert parent.tolist() == [1, 2, -1, 2]
+	assert order.tolist() == [0, 3, 1, 2]
+
+
+def test_isolated_edge_and_node():
+	layer, parent, order = peel({1: [2], 2: [1], 3: []})
+	assert layer.tolist() == [0, 0, 0]
+	assert parent.tolist() == [1, -1, -1]
+	assert order.tolist() == [0, 1, 2]
+
+
+def test_tree_has_empty_core():
+	layer, parent, order = peel({1: [2], 2: [1, 3, 4], 3: [2], 4: [2, 5], 5: [4]})
+	assert np.all(layer >= 0)
+	assert layer.tolist() == [0, 1, 0, 1, 0]
+	assert parent.tolist() == [1, 3, 1, -1, 3]
+	assert order.tolist() == [0, 2, 4, 1, 3]
+
+
+def test_triangle_with_tail():
+	layer, parent, order = peel({1: [2, 3], 2: [1, 3], 3: [1, 2, 4], 4: [3, 5], 5: [4]})
+	assert layer.tolist() == [-1, -1, -1, 1, 0]
+	assert parent.tolist() == [-1, -1, -1, 2, 3]
+	assert order.tolist() == [4, 3]
+
+
+def test_core_of_sbm_graph(sbm_graph):
+	graph, group = sbm_graph(p_in = .01, p_out = .003, seed = 2)
+	layer, parent, order = two_core(graph.indptr, graph.indices)
+	core = layer == -1
+	assert 0 < np.sum(core) < graph.nb_nodes
+	# Every core node keeps at least two core neighbors
+	assert np.all(np.bincount(graph.tails[core[graph.tails] & core[graph.indices]], minlength = graph.nb_nodes)[core] >= 2)
+	# Every peeled node is listed once, after its children, and its parent is one of its neighbors peeled later (or on
+	# the same round, as the root of an isolated tree)
+	assert sorted(order.tolist()) == np.where(~core)[0].tolist()
+	position = np.full(graph.nb_nodes, graph.nb_nodes)
+	position[order] = np.arange(len(order))
+	for u in order[parent[order] >= 0]:
+		p = parent[u]
+		assert p + 1 in graph[u + 1]
+		assert layer[p] == -1 or (layer[p] >= layer[u] and position[p] > position[u])
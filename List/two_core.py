@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def two_core(indptr, indices):
+	"""
+	Peels a graph given by its CSR arrays down to its 2-core, by removing nodes with at most one neighbor left until there
+	is none. The peeled nodes form trees hanging from the core (or isolated trees).
+	Returns the round on which each node is peeled (-1 for the core nodes), the parent of each peeled node (its only
+	neighbor left when it was peeled, or -1 for the root of an isolated tree and for the core nodes) and the peeled nodes
+	in the order they can be processed from the leaves to the core (by round, and each node after all of its children).
+	The messages of the nodes peeled on the same round do not depend on each other.
+	Time: O(|E|)		Space: O(|E|)
+	"""
+	# Number of nodes on the graph
+	N = len(indptr) - 1
+	# The number of neighbors left of each node
+	degrees = np.diff(indptr)
+
+	# The round on which each node is peeled (-1 for the nodes that are not peeled) and its parent
+	layer = np.full(N, -1, dtype = np.int64)
+	parent = np.full(N, -1, dtype = np.int64)
+
+	k = 0
+	leaves, = np.where(degrees <= 1)
+	while len(leaves) > 0:
+		layer[leaves] = k
+
+		# All edges (u, w) going out of the leaves u
+		tails, heads = __edges_of(leaves, indptr, indices)
+		# The neighbors w that are not yet peeled become parents, and two leaves joined by an edge form an isolated tree
+		# whose root is the one with the biggest index
+		alive = layer[heads] == -1
+		child = alive | ((layer[heads] == k) & (tails < heads))
+		parent[tails[child]] = heads[child]
+
+		# The parents lose a neighbor, and the ones left with at most one neighbor are peeled on the next round
+		heads, counts = np.unique(heads[alive], return_counts = True)
+		degrees[heads] -= counts
+		leaves = heads[degrees[heads] <= 1]
+		k += 1
+
+	# The peeled nodes by round, and inside a round the ones whose parent is peeled on the same round first
+	peeled, = np.where(layer >= 0)
+	same_round = (parent[peeled] >= 0) & (layer[np.maximum(parent[peeled], 0)] == layer[peeled])
+	order = peeled[np.lexsort((~same_round, layer[peeled]))]
+
+	return layer, parent, order
+
+
+def __edges_of(nodes, indptr, indices):
+	"""
+	Returns the tails and heads of all edges going out of the given nodes
+	"""
+	starts = indptr[nodes]
+	lengths = indptr[nodes + 1] - starts
+	# The edge codes of each node's CSR segment, concatenated
+	offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+	codes = offsets + np.arange(np.sum(lengths))
+	return np.repeat(nodes, lengths), indices[codes]
@@ -5,13 +5,23 @@ from sklearn.cluster import KMeans
 from scipy.sparse import linalg
 from read_matrix import read_file
 from overlap import overlap
+from bit_matrix import BitMatrix
+from eigensolver import smallest_eigenpairs, negative_count
 
 
 def Bethe_Hessian(adj_matrix, r):
 	"""
-	Given a real number r and the adjacency matrix of a graph, returns its Bethe-Hessian matrix
+	Given a real number r and the adjacency matrix of a graph, returns its Bethe-Hessian matrix (as a linear operator, if
+	the adjacency matrix is a BitMatrix)
 	"""
 	N = len(adj_matrix)
+	if isinstance(adj_matrix, BitMatrix):
+		# The dense Bethe-Hessian matrix is never built: its products use the packed adjacency matrix
+		diagonal = adj_matrix.degrees() + (r*r - 1)
+		operator = linalg.LinearOperator((N, N), matvec = lambda x: diagonal*np.ravel(x) - r*adj_matrix.dot(np.ravel(x)), dtype = float)
+		# The diagonal, for the preconditioner of the eigensolver
+		operator.diagonal = lambda: diagonal
+		return operator
 	degree_matrix = np.zeros((N, N))
 	degrees = np.sum(adj_matrix, axis = 1)
 	for i, deg in enumerate(degrees):
@@ -20,20 +30,36 @@ def Bethe_Hessian(adj_matrix, r):
 	return H
 
 
-def eigenvectors(adj_matrix, q_max):
+def eigenvectors(adj_matrix, q_max, solver = 'auto', inertia = False, start = None):
 	"""
 	Given a graph's adjacency matrix and a maximum number of groups q_max to assign its nodes, returns the eigenvectors
-	of the Bethe-Hessian matrix associated to the group structure
+	of the Bethe-Hessian matrix associated to the group structure, computed by the given solver (see smallest_eigenpairs).
+	If inertia is True, the negative eigenvalues are counted first (see negative_count, which needs a dense adjacency
+	matrix, not a BitMatrix), and only their eigenvectors are computed, instead of q_max eigenpairs. The eigensolves can
+	be warm-started from start, an initial guess of the eigenvectors (such as the ones returned for a closely related
+	graph on the same nodes).
 	"""
 	# The number of nodes in the graph
 	N = len(adj_matrix)
 	# The average degree of a node in the graph
 	c_avg = adj_matrix.sum()/(2*N)
 
+	if inertia:
+		# The Bethe-Hessian matrices with regularizers r = sqrt(c_avg) and r = -sqrt(c_avg), and the number of negative
+		# eigenvalues of each one, up to q_max in total
+		H1 = Bethe_Hessian(adj_matrix, np.sqrt(c_avg))
+		H2 = Bethe_Hessian(adj_matrix, -np.sqrt(c_avg))
+		k1 = min(q_max, negative_count(H1))
+		k2 = min(q_max - k1, negative_count(H2)) if k1 < q_max else 0
+
+		# The eigenvectors of the negative eigenvalues of each matrix
+		eig_vec = [smallest_eigenpairs(H, k, solver, start = start)[1] for H, k in ((H1, k1), (H2, k2)) if k > 0]
+		return np.hstack(eig_vec) if eig_vec else np.zeros((N, 0))
+
 	# Computes the Bethe-Hessian matrix with regularizer r = sqrt(c_avg)
 	H1 = Bethe_Hessian(adj_matrix, np.sqrt(c_avg))
 	# Computes the q_max smallest eigenvalues of H1 and their associated eigenvectors
-	eig_val1, eig_vec1 = linalg.eigsh(H1, k = q_max, which = 'SA')
+	eig_val1, eig_vec1 = smallest_eigenpairs(H1, q_max, solver, start = start)
 
 	# Indexes where the computed eigenvalues of H1 are negative
 	ind1, = np.where(eig_val1 < 0)
@@ -46,7 +72,7 @@ def eigenvectors(adj_matrix, q_max):
 		# Computes the Bethe-Hessian matrix with regularizer r = -sqrt(c_avg)
 		H2 = Bethe_Hessian(adj_matrix, -np.sqrt(c_avg))
 		# Computes the q_max - len(ind1) smallest eigenvalues of H2 and their associated eigenvectors
-		eig_val2, eig_vec2 = linalg.eigsh(H2, k = q_max - len(ind1), which = 'SA')
+		eig_val2, eig_vec2 = smallest_eigenpairs(H2, q_max - len(ind1), solver, start = start)
 
 		# Indexes where the computed eigenvalues of H2 are negative
 		ind2, = np.where(eig_val2 < 0)
@@ -61,15 +87,13 @@ def eigenvectors(adj_matrix, q_max):
 
 		else:
 			# If there are both assortative and disassortative groups
-			eig_vec = np.transpose(eig_vec1[:, ind1])
-			np.append(eig_vec, np.transpose(eig_vec2[:, ind2]), axis = 0)
-			eig_vec = np.transpose(eig_vec)
+			eig_vec = np.append(eig_vec1[:, ind1], eig_vec2[:, ind2], axis = 1)
 
 	# Returns a matrix containing the relevant eigenvectors
 	return eig_vec
 
 
-def BH_cluster_file(file):
+def BH_cluster_file(file, solver = 'auto'):
 	"""
 	Given a file containing a graph's data, returns the normalized overlap between the group assignment infered by
 	the Bethe-Hessian matrix spectral algorithm and the graph's true group assignment
@@ -77,18 +101,18 @@ def BH_cluster_file(file):
 	# Reads the graph's information
 	N, q, adj_matrix, group, n, c = read_file(file)
 	# The relevant eigenvectors for the spectral algorithm
-	eig_vec = eigenvectors(adj_matrix, q)
+	eig_vec = eigenvectors(adj_matrix, q, solver)
 
 	# Clusters the eigenvectors' coordinates in q groups using the K-means algorithm
 	est = KMeans(n_clusters = q)
 	est.fit(eig_vec)
-	est_groups = est.labels_ + np.ones(N, dtype = np.int)
+	est_groups = est.labels_ + np.ones(N, dtype = int)
 
 	# Returns the normalized overlap between the infered group assignment and the actual group assignment
 	return overlap(N, q, n, est_groups, group)
 
 
-def BH_cluster_matrix(adj_matrix, q_max):
+def BH_cluster_matrix(adj_matrix, q_max, solver = 'auto', inertia = False):
 	"""
 	Given a graph's adjacency matrix and a maximum number of groups q_max to assign its nodes, returns the infered
 	group assignment given by the Bethe-Hessian matrix spectral algorithm
@@ -96,18 +120,18 @@ def BH_cluster_matrix(adj_matrix, q_max):
 	# The number of nodes in the graph
 	N = len(adj_matrix)
 	# The relevant eigenvectors for the spectral algorithm
-	eig_vec = eigenvectors(adj_matrix, q_max)
+	eig_vec = eigenvectors(adj_matrix, q_max, solver, inertia)
 
 	# Clusters the eigenvectors' coordinates in q groups using the K-means algorithm
 	est = KMeans(n_clusters = len(eig_vec[0]))
 	est.fit(eig_vec)
-	est_groups = est.labels_ + np.ones(N, dtype = np.int)
+	est_groups = est.labels_ + np.ones(N, dtype = int)
 
 	# Returns the infered group assignment
 	return est_groups
 
 
-def plot_graph(file):
+def plot_graph(file, solver = 'auto'):
 	# Reads the graph's information
 	N, q, adj_matrix, group, n, c = read_file(file)
 	# Checks if the dimension of the embedding space is 2 or 3
@@ -116,11 +140,11 @@ def plot_graph(file):
 		return
 
 	# The relevant eigenvectors for the spectral algorithm
-	eig_vec = eigenvectors(adj_matrix, q)
+	eig_vec = eigenvectors(adj_matrix, q, solver)
 
 	x = [np.array([np.zeros(int(round(N*ni))) for ni in n]) for _ in range(q)]
 	# Separates the eigenvectors' coordinates according to their related groups
-	cont = np.zeros(q, dtype = np.int)
+	cont = np.zeros(q, dtype = int)
 	for i in range(N):
 		for j in range(q):
 			x[j][group[i] - 1][cont[group[i] - 1]] = eig_vec[i, j]
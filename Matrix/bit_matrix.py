@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class BitMatrix:
+	# The bits of each byte value, most significant first (the order of np.packbits), and the number of bits set
+	__byte_bits = np.unpackbits(np.arange(256, dtype = np.uint8)[:, None], axis = 1)
+	__popcount = np.sum(__byte_bits, axis = 1)
+
+	def __init__(self, bits, N):
+		"""
+		A square 0/1 matrix (such as a graph's adjacency matrix) with each row packed in bits by np.packbits, using 8 times
+		less memory than an np.int8 matrix. Supports what the Matrix functions do with an adjacency matrix: row access,
+		degrees and sum, products with vectors and the enumeration of the nonzero entries.
+
+		Attributes:
+		-----------------
+		bits: array[array[np.uint8]]
+			The packed rows, of ceil(N/8) bytes each
+		shape: (int, int)
+			The shape (N, N) of the matrix
+		"""
+		self.bits = bits
+		self.shape = (N, N)
+
+
+	@classmethod
+	def from_dense(cls, adj_matrix):
+		"""
+		Packs a dense 0/1 matrix
+		"""
+		adj_matrix = np.asarray(adj_matrix)
+		return cls(np.packbits(adj_matrix != 0, axis = 1), len(adj_matrix))
+
+
+	@classmethod
+	def from_csr(cls, indptr, indices):
+		"""
+		Builds the packed matrix from its CSR arrays, without building the dense matrix
+		"""
+		N = len(indptr) - 1
+		nb_bytes = (N + 7)//8
+		bits = np.zeros((N, nb_bytes), dtype = np.uint8)
+		tails = np.repeat(np.arange(N, dtype = np.int64), np.diff(indptr))
+		indices = np.asarray(indices, dtype = np.int64)
+		# Each nonzero entry sets a different bit of its byte, so adding the bits is the same as setting them
+		np.add.at(bits.reshape(-1), tails*nb_bytes + indices//8, (128 >> (indices%8)).astype(np.uint8))
+		return cls(bits, N)
+
+
+	def __len__(self):
+		return self.shape[0]
+
+
+	def __getitem__(self, i):
+		"""
+		Returns row i of the matrix as an np.uint8 array
+		"""
+		return np.unpackbits(self.bits[i], count = self.shape[1])
+
+
+	def degrees(self):
+		"""
+		Returns the number of nonzero entries of each row
+		"""
+		degrees = np.zeros(self.shape[0], dtype = np.int64)
+		for start, end in self.__chunks():
+			degrees[start: end] = self.__popcount[self.bits[start: end]].sum(axis = 1)
+		return degrees
+
+
+	def sum(self):
+		"""
+		Returns the number of nonzero entries of the matrix
+		"""
+		return int(np.sum(self.degrees()))
+
+
+	def dot(self, x):
+		"""
+		Returns the product of the matrix with the vector x (or with each column of the matrix x).
+		For each byte position, the sums of x over the bits of all 256 byte values are tabulated, so that each row costs
+		one table look-up per byte instead of one multiplication per entry.
+		"""
+		x = np.asarray(x, dtype = float)
+		if x.ndim == 2:
+			return np.stack([self.dot(column) for column in x.T], axis = 1)
+
+		nb_bytes = self.bits.shape[1]
+		# The entries of x grouped by byte (padded with zeros)
+		x_bytes = np.zeros(8*nb_bytes)
+		x_bytes[: len(x)] = x
+		# table[j, b] is the sum of x over the bits set in byte value b at byte position j
+		table = np.dot(x_bytes.reshape(nb_bytes, 8), self.__byte_bits.T)
+
+		y = np.zeros(self.shape[0])
+		positions = np.arange(nb_bytes)
+		for start, end in self.__chunks():
+			y[start: end] = table[positions, self.bits[start: end]].sum(axis = 1)
+		return y
+
+
+	def __matmul__(self, x):
+		return self.dot(x)
+
+
+	def edges(self):
+		"""
+		Returns the rows and columns of the nonzero entries (0-indexed), sorted by row and then by column
+		"""
+		rows = []
+		cols = []
+		for start, end in self.__chunks():
+			row, col = np.nonzero(np.unpackbits(self.bits[start: end], axis = 1, count = self.shape[1]))
+			rows.append(row + start)
+			cols.append(col)
+		return np.concatenate(rows), np.concatenate(cols)
+
+
+	def toarray(self):
+		"""
+		Returns the dense np.int8 matrix
+		"""
+		return np.unpackbits(self.bits, axis = 1, count = self.shape[1]).astype(np.int8)
+
+
+	def tolist(self):
+		return self.toarray().tolist()
+
+
+	def __chunks(self, size = 2**21):
+		"""
+		Splits the rows in chunks of about size bytes, to bound the temporary arrays
+		"""
+		step = max(1, size//max(self.bits.shape[1], 1))
+		return [(start, min(start + step, self.shape[0])) for start in range(0, self.shape[0], step)]
+
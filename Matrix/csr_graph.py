@@ -0,0 +1,170 @@
+import numpy as np
+from functools import cached_property
+from itertools import chain
+from scipy.sparse import csr_matrix
+
+
+class CSRGraph:
+	def __init__(self, indptr, indices):
+		"""
+		Holds a graph given by the CSR arrays of its (symmetric) adjacency matrix, with 0-indexed nodes: the directed edge
+		code e, from indptr[u] to indptr[u + 1] - 1, is the edge from node u to node indices[e]. The arrays are kept as
+		given (they may be memory-mapped).
+		The other representations of the graph are built from the arrays the first time they are used and then kept, so
+		that switching between the List, Matrix and Sparse functions does not convert the graph again. A CSRGraph can also
+		be used in place of an adjacency list (with 1-indexed nodes, as the List functions expect).
+
+		Attributes:
+		-----------------
+		nb_nodes: int
+			The total number of nodes
+		indptr: array[int]
+			The edges going out of node u have codes from indptr[u] to indptr[u + 1] - 1
+		indices: array[int]
+			The head of each directed edge
+		degrees: array[int]
+			The number of neighbors of each node
+		tails: array[int]
+			The tail of each directed edge (built when used)
+		reverse: array[int]
+			The code of each directed edge's reverse (built when used)
+		adj_list: dict[int: list[int]]
+			The graph's adjacency list, with 1-indexed nodes (built when used)
+		row_col: (array[int], array[int])
+			Rows and columns of the nonzero elements of the adjacency matrix, that is tails and indices (built when used)
+		sparse: csr_matrix
+			The graph's sparse adjacency matrix, sharing the CSR arrays (built when used)
+		adj_matrix: array[array[int]]
+			The graph's dense adjacency matrix (built when used)
+		"""
+		self.indptr = indptr
+		self.indices = indices
+		# Total number of nodes on the graph
+		self.nb_nodes = len(indptr) - 1
+		# The number of neighbors of each node
+		self.degrees = np.diff(indptr)
+
+
+	@classmethod
+	def from_adj_list(cls, adj_list):
+		"""
+		Builds the graph from its adjacency list (with nodes from 1 to N)
+		"""
+		if isinstance(adj_list, CSRGraph):
+			return adj_list
+		# Number of nodes on the graph
+		N = len(adj_list.keys())
+		nodes = range(1, N + 1)
+
+		# The edges going out of node u have codes from indptr[u - 1] to indptr[u] - 1
+		indptr = np.zeros(N + 1, dtype = np.int64)
+		np.cumsum(np.fromiter(map(len, map(adj_list.__getitem__, nodes)), dtype = np.int64, count = N), out = indptr[1:])
+		# The (0-indexed) head of each directed edge
+		indices = np.fromiter(chain.from_iterable(map(adj_list.__getitem__, nodes)), dtype = np.int64, count = indptr[-1])
+		indices -= 1
+		return cls(indptr, indices)
+
+
+	@classmethod
+	def from_row_col(cls, N, row, col):
+		"""
+		Builds the graph from the rows and columns of the nonzero elements of its adjacency matrix (0-indexed nodes)
+		"""
+		row = np.asarray(row, dtype = np.int64)
+		# The edges sorted by row, keeping their order inside each row
+		order = np.argsort(row, kind = 'stable')
+		indptr = np.zeros(N + 1, dtype = np.int64)
+		np.cumsum(np.bincount(row, minlength = N), out = indptr[1:])
+		return cls(indptr, np.asarray(col, dtype = np.int64)[order])
+
+
+	@classmethod
+	def from_matrix(cls, adj_matrix):
+		"""
+		Builds the graph from its (dense or sparse) adjacency matrix
+		"""
+		sparse = csr_matrix(adj_matrix)
+		sparse.sort_indices()
+		return cls(sparse.indptr.astype(np.int64), sparse.indices.astype(np.int64))
+
+
+	@cached_property
+	def tails(self):
+		return np.repeat(np.arange(self.nb_nodes, dtype = np.int64), self.degrees)
+
+
+	@cached_property
+	def reverse(self):
+		return reverse_edges(self.indptr, self.indices)
+
+
+	@cached_property
+	def adj_list(self):
+		# The heads of each node's edges, split at the CSR boundaries
+		neighbors = np.split(np.asarray(self.indices) + 1, self.indptr[1:-1])
+		return {u + 1: heads.tolist() for u, heads in enumerate(neighbors)}
+
+
+	@cached_property
+	def row_col(self):
+		return self.tails, self.indices
+
+
+	@cached_property
+	def sparse(self):
+		sparse = csr_matrix((np.ones(len(self.indices), dtype = np.int8), self.indices, self.indptr), shape = (self.nb_nodes, self.nb_nodes))
+		# scipy casts the index arrays to the smallest type that holds them, so they are put back to share memory
+		if sparse.indices.dtype != self.indices.dtype and self.indices.dtype == self.indptr.dtype:
+			sparse.indices, sparse.indptr = self.indices, self.indptr
+		return sparse
+
+
+	@cached_property
+	def adj_matrix(self):
+		adj_matrix = np.zeros((self.nb_nodes, self.nb_nodes), dtype = np.int8)
+		adj_matrix[self.tails, self.indices] = 1
+		return adj_matrix
+
+
+	# The graph as a read-only adjacency list, with 1-indexed nodes
+	def keys(self):
+		return self.adj_list.keys()
+
+
+	def values(self):
+		return self.adj_list.values()
+
+
+	def items(self):
+		return self.adj_list.items()
+
+
+	def __getitem__(self, u):
+		return self.adj_list[u]
+
+
+	def __iter__(self):
+		return iter(self.adj_list)
+
+
+	def __len__(self):
+		return self.nb_nodes
+
+
+def reverse_edges(indptr, indices):
+	"""
+	Given the CSR arrays of a symmetric graph, returns for each directed edge code (u, v) the code of edge (v, u)
+	"""
+	# Number of nodes on the graph
+	N = len(indptr) - 1
+	# The (0-indexed) tail of each directed edge
+	tails = np.repeat(np.arange(N, dtype = np.int64), np.diff(indptr))
+	indices = np.asarray(indices, dtype = np.int64)
+
+	# Each edge (u, v) is identified by the key u*N + v, and we look up the key v*N + u of its reverse
+	keys = tails*N + indices
+	order = np.argsort(keys, kind = 'stable')
+	pos = np.searchsorted(keys[order], indices*N + tails)
+
+	# Returns the reverse-edge index
+	return order[pos]
@@ -0,0 +1,68 @@
+import warnings
+import numpy as np
+from itertools import islice
+from csr_graph import CSRGraph
+
+
+def read_edge_list(file, delimiter = None, comments = '#', chunk_size = 10**6, numeric_ids = True):
+	"""
+	Reads a graph from a text file with one edge per line: the IDs of its two nodes, separated by delimiter (any
+	whitespace if None, ',' for CSV files), and possibly more columns, which are ignored. The text after comments is
+	ignored as well.
+	The file is parsed by chunks of chunk_size lines with np.loadtxt. Self-loops and repeated edges (in either direction)
+	are dropped, the graph is made symmetric and its nodes are relabeled from 0 to N - 1, so that only the edges (as pairs
+	of integers) are kept in memory. Node IDs are read as integers if numeric_ids is True (and the nodes are numbered in
+	the order of their IDs), and as strings otherwise (the nodes being numbered in the order they appear).
+	Returns the graph (a CSRGraph, which can be used as the adjacency list of the List functions, and whose row_col gives
+	the coordinates used by the Sparse functions) and the ID of each node.
+	"""
+	# The edges of each chunk, as pairs of integer IDs (or of codes of the string IDs)
+	chunks = []
+	# Map from each string ID to its code, in the order they are found
+	codes = {}
+
+	with open(file, 'r') as f:
+		while True:
+			lines = list(islice(f, chunk_size))
+			if not lines:
+				break
+			with warnings.catch_warnings():
+				# A chunk holding only comments is not an error
+				warnings.simplefilter('ignore', UserWarning)
+				edges = np.loadtxt(lines, dtype = np.int64 if numeric_ids else str, delimiter = delimiter, comments = comments, usecols = (0, 1), ndmin = 2)
+			if not numeric_ids:
+				edges = __encode(edges, codes)
+
+			# Each undirected edge once, as (smaller ID, bigger ID), without self-loops
+			edges = np.sort(edges[edges[:, 0] != edges[:, 1]], axis = 1)
+			chunks.append(np.unique(edges, axis = 0))
+
+	edges = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype = np.int64)
+	del chunks
+
+	# The IDs of the nodes, in order, and the edges relabeled from 0 to N - 1
+	ids, edges = np.unique(edges, return_inverse = True)
+	edges = edges.reshape(-1, 2)
+	N = len(ids)
+	if not numeric_ids:
+		ids = np.array(list(codes.keys()))[ids]
+
+	# Drops the edges repeated across chunks
+	keys = np.unique(edges[:, 0]*N + edges[:, 1])
+	del edges
+	tails, heads = keys//N, keys%N
+
+	# Both directions of each edge, sorted by tail and then by head
+	tails, heads = np.concatenate((tails, heads)), np.concatenate((heads, tails))
+	order = np.lexsort((heads, tails))
+	return CSRGraph.from_row_col(N, tails[order], heads[order]), ids
+
+
+def __encode(edges, codes):
+	"""
+	Replaces the string IDs of the edges by integer codes, adding the new IDs to the codes map in the order they appear
+	"""
+	labels, first, inverse = np.unique(edges, return_index = True, return_inverse = True)
+	for label in labels[np.argsort(first)]:
+		codes.setdefault(label, len(codes))
+	return np.fromiter(map(codes.__getitem__, labels), dtype = np.int64, count = len(labels))[inverse].reshape(-1, 2)
@@ -1,33 +1,47 @@
 import numpy as np
+from scipy.sparse import csr_matrix
+from bit_matrix import BitMatrix
 
 
-def non_backtracking(adj_matrix):
+def non_backtracking(adj_matrix, compact = False):
 	"""
-	For a graph given by its adjacency matrix, returns its non-backtracking matrix and edge dictionary
-	Time: O(|E|^2)		Space: O(|E|^2)
+	For a graph given by its adjacency matrix (dense or a BitMatrix), returns its CSR sparse non-backtracking matrix and
+	edge dictionary (the list of the (u, v) pairs of 1-indexed nodes of each edge code, or, if compact is True, the same
+	pairs as the rows of a (2|E|, 2) array)
+	Time: O(N^2 + sum of deg^2)		Space: O(sum of deg^2)
 	"""
 	# Number of nodes on the graph
 	N = len(adj_matrix)
 
+	# The nonzero entries of the adjacency matrix (read from the packed bits if it is a BitMatrix), sorted by row
+	tails, heads = adj_matrix.edges() if isinstance(adj_matrix, BitMatrix) else np.nonzero(adj_matrix)
+	tails = tails.astype(np.int64)
+	heads = heads.astype(np.int64)
+	# The edges going out of node u have codes from indptr[u - 1] to indptr[u] - 1
+	indptr = np.searchsorted(tails, np.arange(N + 1))
+	count = len(tails)
+
+	# Each edge (u, v) is joined with every edge (v, w) going out of its head: row uv gets the codes from indptr[v - 1]
+	# to indptr[v] - 1
+	lengths = indptr[heads + 1] - indptr[heads]
+	row = np.repeat(np.arange(count, dtype = np.int64), lengths)
+	# The position of each pair inside its row, added to the first code of the row's range
+	starts = np.cumsum(lengths) - lengths
+	col = np.arange(len(row), dtype = np.int64) - np.repeat(starts - indptr[heads], lengths)
+
+	# Drops the pairs going back (w = u)
+	keep = heads[col] != tails[row]
+	row, col = row[keep], col[keep]
+
+	# The pairs are already sorted by row and then by column
+	row_ptr = np.zeros(count + 1, dtype = np.int64)
+	np.cumsum(np.bincount(row, minlength = count), out = row_ptr[1:])
+	non_backtr = csr_matrix((np.ones(len(col), dtype = np.int8), col, row_ptr), shape = (count, count))
+
 	# Maps linking each (directed) edge of the graph and a code from 0 to 2|E| - 1
-	edge_to_code = {}
-	code_to_edge = []
-	count = 0
-	for u in range(1, N + 1):
-		for v in range(1, N + 1):
-			if adj_matrix[u - 1][v - 1]:
-				edge_to_code[(u, v)] = count
-				code_to_edge.append((u, v))
-				count += 1
-	
-	# Construction of the non-backtracking matrix for this graph
-	non_backtr = np.zeros((count, count), dtype = np.int8)
-	for u in range(1, N + 1):
-		for v in range(1, N + 1):
-			if adj_matrix[u - 1][v - 1]:
-				for w in range(1, N + 1):
-					if adj_matrix[v - 1][w - 1] and u != w:
-						non_backtr[edge_to_code[(u, v)]][edge_to_code[(v, w)]] = 1
-	
-	# Returns the non-backtracking matrix (numpy int matrix) and edge dictionary
+	code_to_edge = np.stack((tails + 1, heads + 1), axis = 1)
+	if not compact:
+		code_to_edge = list(map(tuple, code_to_edge.tolist()))
+
+	# Returns the non-backtracking matrix (scipy sparse csr_matrix) and edge dictionary
 	return non_backtr, code_to_edge
@@ -0,0 +1,26 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The modules of this directory import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sbm_csr import sbm_csr
+from csr_graph import CSRGraph
+
+
+@pytest.fixture
+def sbm_graph():
+	"""
+	Draws a graph of the stochastic block model from the number of nodes of each group, the edge probabilities inside and
+	between groups and a seed, and returns it as a CSRGraph (whose adj_matrix is the dense adjacency matrix) along with
+	the group of each node
+	"""
+	def draw(nb_vector = (150, 150), p_in = .06, p_out = .01, seed = 3):
+		q = len(nb_vector)
+		prob_matrix = np.full((q, q), p_out) + (p_in - p_out)*np.eye(q)
+		indptr, indices, group, edge_prop = sbm_csr(np.array(nb_vector), prob_matrix, seed = seed)
+		return CSRGraph(indptr, indices), group
+	return draw
+
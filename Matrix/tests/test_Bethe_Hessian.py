@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+from Bethe_Hessian import eigenvectors
+
+
+@pytest.mark.parametrize('nb_vector, p_in, p_out', [((100, 100), .05, .01), ((100, 100), .01, .06), ((60, 60, 60), .1, .01)])
+def test_inertia_matches_eigensolve(sbm_graph, nb_vector, p_in, p_out):
+	# Assortative groups (negative eigenvalues of H(sqrt(c))) and disassortative ones (of H(-sqrt(c)))
+	graph, group = sbm_graph(nb_vector, p_in, p_out, seed = 4)
+	expected = eigenvectors(graph.adj_matrix, 6)
+	result = eigenvectors(graph.adj_matrix, 6, inertia = True)
+	assert result.shape == expected.shape == (graph.nb_nodes, len(nb_vector))
+	# The same unit eigenvectors, up to sign
+	assert np.allclose(np.abs(np.sum(result*expected, axis = 0)), 1)
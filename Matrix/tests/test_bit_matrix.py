@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from bit_matrix import BitMatrix
+from non_backtr_matrix import non_backtracking
+
+
+def graph(sbm_graph, N):
+	# An SBM graph whose number of nodes is not a multiple of 8, as CSR arrays and as a dense matrix
+	csr, group = sbm_graph((N//2, N - N//2), .2, .05, seed = 9)
+	return csr.indptr, csr.indices, csr.adj_matrix
+
+
+@pytest.mark.parametrize('N', [1, 8, 61])
+def test_bit_matrix_matches_dense(sbm_graph, N):
+	indptr, indices, adj_matrix = graph(sbm_graph, N)
+	bits = BitMatrix.from_csr(indptr, indices)
+	x = np.random.default_rng(0).standard_normal((N, 3))
+
+	assert np.array_equal(bits.toarray(), adj_matrix)
+	assert np.array_equal(BitMatrix.from_dense(adj_matrix).bits, bits.bits)
+	assert all(np.array_equal(bits[i], adj_matrix[i]) for i in range(N))
+	assert np.array_equal(bits.degrees(), np.sum(adj_matrix, axis = 1))
+	assert bits.sum() == np.sum(adj_matrix)
+	assert np.allclose(bits.dot(x[:, 0]), adj_matrix @ x[:, 0])
+	assert np.allclose(bits @ x, adj_matrix @ x)
+	assert all(np.array_equal(a, b) for a, b in zip(bits.edges(), np.nonzero(adj_matrix)))
+
+
+def test_non_backtracking_matches_dense(sbm_graph):
+	indptr, indices, adj_matrix = graph(sbm_graph, 61)
+	expected, expected_edges = non_backtracking(adj_matrix)
+	result, edges = non_backtracking(BitMatrix.from_csr(indptr, indices))
+	assert edges == expected_edges
+	assert (result != expected).nnz == 0
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from graph_file import VERSION, convert_text_file, is_graph_file, read_graph
+from graph_matrix import Graph
+from read_matrix import read_file
+
+
+@pytest.fixture
+def files(tmp_path):
+	"""
+	Writes a graph as text, as a binary graph file and as the conversion of the text file, and returns their paths
+	"""
+	graph = Graph(np.array([40, 60]), np.array([[.2, .05], [.05, .15]]), seed = 2)
+	paths = {name: tmp_path/name for name in ('text', 'binary', 'converted')}
+	graph.write_in_file(paths['text'])
+	graph.write_binary(paths['binary'])
+	convert_text_file(paths['text'], paths['converted'])
+	return paths
+
+
+@pytest.mark.parametrize('name', ['binary', 'converted'])
+def test_binary_file_reads_as_text_file(files, name):
+	assert is_graph_file(files[name]) and not is_graph_file(files['text'])
+	N, q, adj_matrix, group, n, c = read_file(files['text'])
+	read_N, read_q, read_adj_matrix, read_group, read_n, read_c = read_file(files[name])
+	assert (read_N, read_q) == (N, q)
+	assert np.array_equal(read_adj_matrix, adj_matrix)
+	assert np.array_equal(read_group, group) and np.allclose(read_n, n) and np.allclose(read_c, c)
+
+
+def test_converted_file_is_a_direct_write(files):
+	assert files['converted'].read_bytes() == files['binary'].read_bytes()
+
+
+@pytest.mark.parametrize('offset, data', [(0, b'NOTGRAPH'), (8, np.array([VERSION + 1], dtype = '<u4').tobytes())])
+def test_bad_header_raises(files, offset, data):
+	# A wrong magic number or a newer version
+	with open(files['binary'], 'r+b') as f:
+		f.seek(offset)
+		f.write(data)
+	with pytest.raises(Exception):
+		read_graph(files['binary'])
@@ -2,38 +2,135 @@ import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 from sklearn.cluster import KMeans
-from scipy.sparse import linalg, csr_matrix
-from read_sparse import read_file
+from scipy.sparse import linalg, csr_matrix, issparse, diags
+from read_sparse import read_sparse, read_stream
 from overlap import overlap
+from eigensolver import smallest_eigenpairs, negative_count
+
+
+def adjacency(N, row, col):
+	"""
+	Given the rows and columns of the nonzero elements of a graph's adjacency matrix, returns it as a CSR sparse matrix,
+	and the degree of each node
+	"""
+	row = np.asarray(row, dtype = np.int64)
+	# The nodes' degree array
+	degrees = np.bincount(row, minlength = N).astype(float)
+	return csr_matrix((np.ones(len(row)), (row, np.asarray(col, dtype = np.int64))), shape = (N, N)), degrees
 
 
 def Bethe_Hessian(N, row, col, r):
 	"""
 	Given a real number r and the adjacency matrix of a graph, returns its Bethe-Hessian matrix
 	"""
-	# All indexes array
-	ind = np.arange(N)
-	# The nodes' degree array
-	degrees = np.zeros(N)
-	for i in row:
-		degrees[i] += 1
+	adj_matrix, degrees = adjacency(N, row, col)
 	# Returns the Bethe-Hessian matrix with regularizer r
-	H = csr_matrix((degrees + (r*r - 1), (ind, ind)), shape = (N, N)) - csr_matrix((r*np.ones(len(row)), (row, col)), shape = (N, N))
-	return H
+	return (diags(degrees + (r*r - 1)) - r*adj_matrix).tocsr()
+
+
+def Bethe_Hessian_operator(adj_matrix, degrees, r):
+	"""
+	Given a real number r, a graph's adjacency matrix (as returned by adjacency, or anything with a matrix product) and
+	its nodes' degrees, returns its Bethe-Hessian matrix H(r) = (r^2 - 1)I - rA + D as a linear operator, whose products
+	take one product with the adjacency matrix, so that no matrix is built for each r
+	"""
+	N = len(degrees)
+	# The diagonal part of the Bethe-Hessian matrix
+	diagonal = degrees + (r*r - 1)
+
+	def product(x):
+		x = np.ravel(x)
+		return diagonal*x - r*(adj_matrix @ x)
+
+	operator = linalg.LinearOperator((N, N), matvec = product, rmatvec = product, dtype = float)
+	# The diagonal, for the preconditioner of the eigensolver
+	operator.diagonal = lambda: diagonal
+	return operator
 
 
-def eigenvectors(N, row, col, q_max):
+def Bethe_Hessian_stream(N, indptr, indices, r, chunk_size = 10**7):
+	"""
+	Given a real number r and the CSR arrays of a graph's adjacency matrix (which may be memory-mapped), returns its
+	Bethe-Hessian matrix as a linear operator, whose products read the arrays by chunks of about chunk_size edges
+	"""
+	# The nodes' degree array
+	degrees = np.diff(indptr).astype(float)
+	# The first node of each chunk of rows, so that each chunk has about chunk_size edges
+	bounds = np.unique(np.concatenate((np.searchsorted(indptr, np.arange(0, indptr[-1], chunk_size), side = 'right') - 1, [0, N])))
+
+	def product(x):
+		x = np.ravel(x)
+		# The diagonal part of the Bethe-Hessian matrix
+		y = (degrees + (r*r - 1))*x
+		# Minus r times the adjacency matrix, summed over each row's CSR segment
+		for start, end in zip(bounds[:-1], bounds[1:]):
+			values = x[np.asarray(indices[indptr[start]: indptr[end]])]
+			rows = np.arange(start, end)[indptr[start: end] < indptr[start + 1: end + 1]]
+			if len(rows) > 0:
+				y[rows] -= r*np.add.reduceat(values, indptr[rows] - indptr[start])
+		return y
+
+	operator = linalg.LinearOperator((N, N), matvec = product, dtype = float)
+	# The diagonal, for the preconditioner of the eigensolver
+	operator.diagonal = lambda: degrees + (r*r - 1)
+	return operator
+
+
+def eigenvectors(N, row, col, q_max, cache = None, solver = 'auto', inertia = False, start = None):
 	"""
 	Given a graph's adjacency matrix and a maximum number of groups q_max to assign its nodes, returns the eigenvectors
-	of the Bethe-Hessian matrix associated to the group structure
+	of the Bethe-Hessian matrix associated to the group structure, computed by the given solver (see
+	smallest_eigenpairs). If inertia is True, the negative eigenvalues are counted first (see negative_count), and only
+	their eigenvectors are computed, instead of q_max eigenpairs, which is faster when q_max is much bigger than the
+	number of groups and the graph is small enough to be factorized. If cache (an OperatorCache) is given, the
+	Bethe-Hessian matrices and their eigenpairs are read from it when this graph's were already computed, and stored in
+	it otherwise. The eigensolves can be warm-started from start, an initial guess of the eigenvectors (such as the ones
+	returned for a closely related graph on the same nodes, like the previous graph of a sweep drawn with the same seed).
 	"""
 	# The average degree of a node in the graph
 	c_avg = len(row)/N
+	key = None if cache is None else cache.key(np.array([N]), np.asarray(row, dtype = np.int64), np.asarray(col, dtype = np.int64))
+	# The adjacency matrix is built once, for both regularizers
+	adj_matrix, degrees = adjacency(N, row, col)
+	# The Bethe-Hessian matrix, needed by the shift-invert solver and the inertia count, which factorize it
+	matrix = lambda r: (diags(degrees + (r*r - 1)) - r*adj_matrix).tocsr()
+	hessian = matrix if solver == 'shift_invert' else lambda r: Bethe_Hessian_operator(adj_matrix, degrees, r)
+	counts = (lambda r: negative_count(matrix(r))) if inertia else None
+	return __eigenvectors(c_avg, hessian, q_max, cache, key, solver, counts, start)
+
 
-	# Computes the Bethe-Hessian matrix with regularizer r = sqrt(c_avg)
-	H1 = Bethe_Hessian(N, row, col, np.sqrt(c_avg))
-	# Computes the q_max smallest eigenvalues of H1 and their associated eigenvectors
-	eig_val1, eig_vec1 = linalg.eigsh(H1, k = q_max, which = 'SA')
+def eigenvectors_stream(N, indptr, indices, q_max, cache = None, solver = 'auto', start = None):
+	"""
+	Same as eigenvectors, for a graph given by the CSR arrays of its adjacency matrix (which may be memory-mapped)
+	"""
+	# The average degree of a node in the graph
+	c_avg = indptr[-1]/N
+	key = None if cache is None else cache.key(indptr, indices)
+	return __eigenvectors(c_avg, lambda r: Bethe_Hessian_stream(N, indptr, indices, r), q_max, cache, key, solver, None, start)
+
+
+def __eigenvectors(c_avg, hessian, q_max, cache = None, key = None, solver = 'auto', counts = None, start = None):
+	"""
+	Returns the eigenvectors associated to the group structure of the Bethe-Hessian matrices hessian(r) of a graph with
+	average degree c_avg (whose entries in cache have the given key), computed by the given solver, starting from start.
+	If counts is given, counts(r) is the number of negative eigenvalues of hessian(r), and only their eigenpairs are
+	computed.
+	"""
+	if counts is not None:
+		# The number of negative eigenvalues of H(sqrt(c_avg)) and then, if there are less than q_max, of H(-sqrt(c_avg))
+		k1 = min(q_max, counts(np.sqrt(c_avg)))
+		k2 = min(q_max - k1, counts(-np.sqrt(c_avg))) if k1 < q_max else 0
+
+		# The eigenvectors of the negative eigenvalues of each matrix
+		eig_vec = [__smallest_eigenpairs(hessian, r, k, cache, key, solver, start)[1] for r, k in ((np.sqrt(c_avg), k1), (-np.sqrt(c_avg), k2)) if k > 0]
+		if not eig_vec:
+			# No group structure was found
+			return np.zeros((hessian(np.sqrt(c_avg)).shape[0], 0))
+		return np.hstack(eig_vec)
+
+	# Computes the q_max smallest eigenvalues of the Bethe-Hessian matrix with regularizer r = sqrt(c_avg) and their
+	# associated eigenvectors
+	eig_val1, eig_vec1 = __smallest_eigenpairs(hessian, np.sqrt(c_avg), q_max, cache, key, solver, start)
 
 	# Indexes where the computed eigenvalues of H1 are negative
 	ind1, = np.where(eig_val1 < 0)
@@ -43,10 +140,9 @@ def eigenvectors(N, row, col, q_max):
 		eig_vec = eig_vec1
 
 	else:
-		# Computes the Bethe-Hessian matrix with regularizer r = -sqrt(c_avg)
-		H2 = Bethe_Hessian(N, row, col, -np.sqrt(c_avg))
-		# Computes the q_max - len(ind1) smallest eigenvalues of H2 and their associated eigenvectors
-		eig_val2, eig_vec2 = linalg.eigsh(H2, k = q_max - len(ind1), which = 'SA')
+		# Computes the q_max - len(ind1) smallest eigenvalues of the Bethe-Hessian matrix with regularizer r = -sqrt(c_avg)
+		# and their associated eigenvectors
+		eig_val2, eig_vec2 = __smallest_eigenpairs(hessian, -np.sqrt(c_avg), q_max - len(ind1), cache, key, solver, start)
 
 		# Indexes where the computed eigenvalues of H2 are negative
 		ind2, = np.where(eig_val2 < 0)
@@ -61,28 +157,52 @@ def eigenvectors(N, row, col, q_max):
 
 		else:
 			# If there are both assortative and disassortative groups
-			eig_vec = np.transpose(eig_vec1[:, ind1])
-			np.append(eig_vec, np.transpose(eig_vec2[:, ind2]), axis = 0)
-			eig_vec = np.transpose(eig_vec)
+			eig_vec = np.append(eig_vec1[:, ind1], eig_vec2[:, ind2], axis = 1)
 
 	# Returns a matrix containing the relevant eigenvectors
 	return eig_vec
 
 
-def BH_cluster_file(file, plot_graph = False):
+def __smallest_eigenpairs(hessian, r, k, cache, key, solver = 'auto', start = None):
+	"""
+	Returns the k smallest eigenvalues of the Bethe-Hessian matrix hessian(r) and their associated eigenvectors, computed
+	by the given solver from the initial guess start, reading the matrix and its eigenpairs from cache (if not None) when
+	they are there, and storing them otherwise. The eigenpairs are stored for each solver, since an iterative solver may
+	stop before converging.
+	"""
+	name = 'bethe_hessian_' + repr(float(r))
+	if cache is not None:
+		eigenpairs = cache.load(key, name + '_eigenpairs_' + str(k) + '_' + solver)
+		if eigenpairs is not None:
+			return eigenpairs['eig_val'], eigenpairs['eig_vec']
+
+	# The Bethe-Hessian matrix (only sparse matrices are stored, not linear operators)
+	H = None if cache is None else cache.load_sparse(key, name)
+	if H is None:
+		H = hessian(r)
+		if cache is not None and issparse(H):
+			cache.save_sparse(key, name, H)
+
+	eig_val, eig_vec = smallest_eigenpairs(H, k, solver, start = start)
+	if cache is not None:
+		cache.save(key, name + '_eigenpairs_' + str(k) + '_' + solver, {'eig_val': eig_val, 'eig_vec': eig_vec})
+	return eig_val, eig_vec
+
+
+def BH_cluster_file(file, plot_graph = False, cache = None, solver = 'auto'):
 	"""
 	Given a file containing a graph's data, returns the normalized overlap between the group assignment infered by
 	the Bethe-Hessian matrix spectral algorithm and the graph's true group assignment
 	"""
 	# Reads the graph's information
-	N, q, row, col, group, n, c = read_file(file)
+	N, q, row, col, group, n, c = read_sparse(file)
 	# The relevant eigenvectors for the spectral algorithm
-	eig_vec = eigenvectors(N, row, col, q)
+	eig_vec = eigenvectors(N, row, col, q, cache, solver)
 
 	# Clusters the eigenvectors' coordinates in q groups using the K-means algorithm
 	est = KMeans(n_clusters = q)
 	est.fit(eig_vec)
-	est_groups = est.labels_ + np.ones(N, dtype = np.int)
+	est_groups = est.labels_ + np.ones(N, dtype = int)
 
 	# The normalized overlap between the infered group assignment and the actual group assignment
 	ovlp = overlap(N, q, n, est_groups, group)
@@ -91,7 +211,7 @@ def BH_cluster_file(file, plot_graph = False):
 	if plot_graph and q <= 3:
 		x = [np.array([np.zeros(int(round(N*ni))) for ni in n]) for _ in range(q)]
 		# Separates the eigenvectors' coordinates according to their related groups
-		cont = np.zeros(q, dtype = np.int)
+		cont = np.zeros(q, dtype = int)
 		for i in range(N):
 			for j in range(q):
 				x[j][group[i] - 1][cont[group[i] - 1]] = eig_vec[i, j]
@@ -116,18 +236,38 @@ def BH_cluster_file(file, plot_graph = False):
 	return ovlp
 
 
-def BH_cluster_sparse(N, row, col, q_max):
+def BH_cluster_stream(directory, cache = None, solver = 'auto'):
+	"""
+	Given a directory containing a graph's data written by sbm_stream, returns the normalized overlap between the group
+	assignment infered by the Bethe-Hessian matrix spectral algorithm and the graph's true group assignment, without
+	loading the graph's edges in memory
+	"""
+	# Reads the graph's information, with its edges memory-mapped
+	N, q, indptr, indices, group, n, c = read_stream(directory)
+	# The relevant eigenvectors for the spectral algorithm
+	eig_vec = eigenvectors_stream(N, indptr, indices, q, cache, solver)
+
+	# Clusters the eigenvectors' coordinates in q groups using the K-means algorithm
+	est = KMeans(n_clusters = q)
+	est.fit(eig_vec)
+	est_groups = est.labels_ + 1
+
+	# Returns the normalized overlap between the infered group assignment and the actual group assignment
+	return overlap(N, q, n, est_groups, group)
+
+
+def BH_cluster_sparse(N, row, col, q_max, cache = None, solver = 'auto', inertia = False):
 	"""
 	Given a graph's adjacency matrix and a maximum number of groups q_max to assign its nodes, returns the infered
 	group assignment given by the Bethe-Hessian matrix spectral algorithm
 	"""
 	# The relevant eigenvectors for the spectral algorithm
-	eig_vec = eigenvectors(N, row, col, q_max)
+	eig_vec = eigenvectors(N, row, col, q_max, cache, solver, inertia)
 
 	# Clusters the eigenvectors' coordinates in q groups using the K-means algorithm
 	est = KMeans(n_clusters = len(eig_vec[0]))
 	est.fit(eig_vec)
-	est_groups = est.labels_ + np.ones(N, dtype = np.int)
+	est_groups = est.labels_ + np.ones(N, dtype = int)
 
 	# Returns the infered group assignment
 	return est_groups
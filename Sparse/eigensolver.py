@@ -0,0 +1,153 @@
+import numpy as np
+from scipy.linalg import eigh, ldl
+from scipy.sparse import linalg, issparse, diags, identity
+
+
+# The solvers of smallest_eigenpairs
+SOLVERS = ('auto', 'dense', 'arpack', 'shift_invert', 'lobpcg')
+# The numbers of nodes up to which 'auto' uses the dense solver and ARPACK
+DENSE_MAX = 1000
+ARPACK_MAX = 10**5
+# The maximum number of LOBPCG iterations
+LOBPCG_MAXITER = 200
+# The eigenvalues that negative_count takes as zero, relative to the biggest diagonal entry
+INERTIA_TOL = 1e-10
+
+
+def smallest_eigenpairs(H, k, solver = 'auto', tol = None, seed = 0, start = None):
+	"""
+	Returns the k smallest eigenvalues of the symmetric matrix H (dense, sparse or a linear operator), in increasing
+	order, and their associated eigenvectors, computed by the given solver:
+		'dense': LAPACK eigh of the dense matrix, restricted to the k smallest eigenpairs
+		'arpack': ARPACK (eigsh) on the smallest algebraic eigenvalues
+		'shift_invert': ARPACK on the inverse of H - sigma*I, with sigma a lower bound of the spectrum of H, so that the
+			smallest eigenvalues become the biggest ones. H must be a matrix, which is factorized: this is only fast when
+			its factors stay sparse (not on random graphs with many nodes)
+		'lobpcg': LOBPCG preconditioned by the inverse of the diagonal of H (for a Bethe-Hessian matrix, the degrees plus
+			r^2 - 1), which only needs products with H and stops after LOBPCG_MAXITER iterations. If an eigenpair has
+			not converged by then (its residual norm is above tol), ARPACK is run from the eigenvectors found
+		'auto': 'dense' for at most DENSE_MAX nodes, 'arpack' for at most ARPACK_MAX nodes and 'lobpcg' otherwise
+	The diagonal of H is read with H.diagonal() (which the linear operators of the Bethe-Hessian functions have, and
+	without which LOBPCG is not preconditioned). tol is the tolerance of the iterative solvers (machine precision for
+	ARPACK and 1e-5 for LOBPCG if None). Each eigenvector's sign is fixed so that its biggest entry (in absolute value)
+	is positive, so that all solvers return the same eigenvectors.
+	start is an initial guess of the eigenvectors (an array of N rows, such as the eigenvectors of a previous solve on a
+	related matrix): the initial subspace of LOBPCG (completed with random vectors if it has less than k columns), and
+	the starting vector of ARPACK (the sum of its columns). The dense solver ignores it.
+	"""
+	N = H.shape[0]
+	if solver not in SOLVERS:
+		raise Exception("Unknown solver: " + str(solver))
+	if solver == 'auto':
+		solver = 'dense' if N <= DENSE_MAX else 'arpack' if N <= ARPACK_MAX else 'lobpcg'
+	# LOBPCG needs the searched subspace to be small compared to the matrix, and ARPACK needs k < N
+	if N <= max(5*k, k + 1):
+		solver = 'dense'
+
+	if start is not None:
+		start = np.asarray(start, dtype = float).reshape(N, -1)[:, : k]
+	# The starting vector of ARPACK
+	v0 = None if start is None or not np.any(start) else np.sum(start/np.linalg.norm(start, axis = 0).clip(1e-300), axis = 1)
+
+	if solver == 'dense':
+		eig_val, eig_vec = eigh(__dense(H), subset_by_index = [0, k - 1])
+
+	elif solver == 'arpack':
+		eig_val, eig_vec = linalg.eigsh(H, k = k, which = 'SA', tol = tol or 0, v0 = v0)
+
+	elif solver == 'shift_invert':
+		if isinstance(H, linalg.LinearOperator):
+			raise Exception("The shift-invert solver needs a matrix!")
+		eig_val, eig_vec = linalg.eigsh(H, k = k, sigma = __lower_bound(H), which = 'LM', tol = tol or 0, v0 = v0)
+
+	else:
+		# The initial subspace (random, or starting with the given vectors), and the inverse of the diagonal as
+		# preconditioner
+		X = np.random.default_rng(seed).standard_normal((N, k))
+		if start is not None:
+			# Zero columns (which LOBPCG cannot orthonormalize) are left random
+			columns, = np.nonzero(np.any(start, axis = 0))
+			X[:, columns] = start[:, columns]
+		preconditioner = None
+		if hasattr(H, 'diagonal'):
+			diagonal = np.array(H.diagonal(), dtype = float)
+			diagonal[np.abs(diagonal) < 1e-12] = 1
+			preconditioner = diags(1/diagonal)
+		eig_val, eig_vec = linalg.lobpcg(H, X, M = preconditioner, tol = tol or 1e-5, largest = False, maxiter = LOBPCG_MAXITER)
+
+		# The residual norms of the eigenpairs, which are all below the tolerance once LOBPCG has converged
+		residuals = np.linalg.norm(H.dot(eig_vec) - eig_vec*eig_val, axis = 0)
+		if np.any(residuals > (tol or 1e-5)):
+			v0 = np.sum(eig_vec, axis = 1)
+			eig_val, eig_vec = linalg.eigsh(H, k = k, which = 'SA', tol = tol or 0, v0 = v0 if np.any(v0) else None)
+
+	# Sorted in increasing order, with the sign of each eigenvector fixed
+	ind = np.argsort(eig_val)
+	eig_val, eig_vec = eig_val[ind], eig_vec[:, ind]
+	signs = np.sign(eig_vec[np.argmax(np.abs(eig_vec), axis = 0), np.arange(k)])
+	signs[signs == 0] = 1
+	return eig_val, eig_vec*signs
+
+
+def negative_count(H):
+	"""
+	Returns the number of negative eigenvalues of the symmetric matrix H (dense or sparse), by Sylvester's law of inertia:
+	it is the number of negative entries of D in a factorization H = L D L^T (with symmetric pivoting), which is much
+	cheaper than the eigenvalues when the factors stay sparse (for sparse H, its cost grows quickly with the number of
+	nodes of random graphs, whose factors fill in).
+	The eigenvalues above -tol, with tol = INERTIA_TOL times the biggest diagonal entry, are counted as nonnegative: these
+	are the negative eigenvalues of H + tol*I, whose factorization has no zero pivot of random sign when H is singular
+	(as H(1) = D - A)
+	"""
+	if isinstance(H, linalg.LinearOperator):
+		raise Exception("Counting the negative eigenvalues needs a matrix!")
+	tol = INERTIA_TOL*max(1, np.max(np.abs(H.diagonal()), initial = 0))
+	if not issparse(H):
+		# D has 1x1 and 2x2 blocks, the latter having nonzero entries above the diagonal
+		_, D, _ = ldl(np.asarray(H, dtype = float) + tol*np.eye(H.shape[0]))
+		diagonal = np.diagonal(D)
+		starts, = np.nonzero(np.diagonal(D, 1))
+		in_block = np.zeros(len(diagonal), dtype = bool)
+		in_block[starts] = in_block[starts + 1] = True
+		# A 2x2 block has one negative eigenvalue if its determinant is negative, and two if it is positive and its trace
+		# is negative
+		a, b, c = diagonal[starts], np.diagonal(D, 1)[starts], diagonal[starts + 1]
+		determinant = a*c - b*b
+		return int(np.sum(diagonal[~in_block] < 0) + np.sum(determinant < 0) + 2*np.sum((determinant > 0) & (a + c < 0)))
+
+	H = H.tocsc()
+	for shift in (tol, 100*tol):
+		# SuperLU with a symmetric ordering and diagonal pivots gives H = L U with U = D L^T, unless a zero pivot forces
+		# a row exchange or the shifted matrix is still singular, in which case it is shifted a bit more
+		try:
+			lu = linalg.splu(H + shift*identity(H.shape[0], format = 'csc'), permc_spec = 'MMD_AT_PLUS_A', diag_pivot_thresh = 0, options = dict(SymmetricMode = True))
+		except RuntimeError:
+			continue
+		if np.array_equal(lu.perm_r, lu.perm_c):
+			return int(np.sum(lu.U.diagonal() < 0))
+	raise Exception("Could not factorize the matrix symmetrically!")
+
+
+def __dense(H):
+	"""
+	Returns the dense array of H
+	"""
+	if issparse(H):
+		return H.toarray()
+	if isinstance(H, linalg.LinearOperator):
+		return H.matmat(np.eye(H.shape[0]))
+	return np.asarray(H, dtype = float)
+
+
+def __lower_bound(H):
+	"""
+	Returns a lower bound of the eigenvalues of the symmetric matrix H (by the Gershgorin circle theorem), minus a margin
+	so that H - sigma*I is positive definite
+	"""
+	diagonal = H.diagonal()
+	if issparse(H):
+		radius = np.ravel(abs(H).sum(axis = 1)) - np.abs(diagonal)
+	else:
+		radius = np.sum(np.abs(H), axis = 1) - np.abs(diagonal)
+	bound = np.min(diagonal - radius)
+	return bound - 1e-3*max(1, abs(bound))
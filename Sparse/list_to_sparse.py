@@ -1,21 +1,9 @@
-import numpy as np
-from scipy.sparse import csr_matrix
+from csr_graph import CSRGraph
 
 
 def list_to_sparse(adj_list):
 	"""
-	Given the adjacency list of a graph, returns its corresponding sparse CSR adjacency matrix
+	Given the adjacency list of a graph (or a CSRGraph), returns the coordinates of its adjacency matrix nonzero elements
 	"""
-	# Number of nodes on the graph
-	N = len(adj_list.keys())
-
-	# Construction of the graph's sparse adjacency matrix
-	row = []
-	col = []
-	for u in adj_list.keys():
-		for v in adj_list[u]:
-			row.append(u - 1)
-			col.append(v - 1)
-	
-	# Returns the coordinates of the graph's adjacency matrix nonzero elements
-	return row, col
+	# Returns the rows and columns of the graph's adjacency matrix nonzero elements
+	return CSRGraph.from_adj_list(adj_list).row_col
@@ -1,10 +1,18 @@
+import os
 import numpy as np
+from graph_file import is_graph_file, read_graph
 
 
 def read_sparse(file):
 	"""
-	Reads and returns the graph's data written on a file
+	Reads and returns the graph's data written on a file (as text by write_in_file, or as a binary graph file whose
+	arrays are memory-mapped)
 	"""
+	if is_graph_file(file):
+		N, q, graph, group, n, c = read_graph(file)
+		row, col = graph.row_col
+		return N, q, row, col, group, n, c
+
 	# File where the graph data is writen
 	f = open(file, 'r')
 
@@ -26,3 +34,26 @@ def read_sparse(file):
 	
 	# Returns all data
 	return N, q, row, col, group, n, c
+
+
+def read_stream(directory):
+	"""
+	Reads the graph's data written on a directory by sbm_stream, with the CSR arrays of its adjacency matrix memory-mapped
+	instead of loaded in memory
+	"""
+	# CSR arrays of the adjacency matrix
+	indptr = np.load(os.path.join(directory, 'indptr.npy'), mmap_mode = 'r')
+	indices = np.load(os.path.join(directory, 'indices.npy'), mmap_mode = 'r')
+	# Number of nodes
+	N = len(indptr) - 1
+	# Group assignment for each node
+	group = np.load(os.path.join(directory, 'group.npy'))
+	# Number of groups
+	q = int(np.max(group, initial = 0))
+	# Proportion of nodes on each group
+	n = np.bincount(group, minlength = q + 1)[1:]/N
+	# Edge probability matrix times N
+	c = np.load(os.path.join(directory, 'edge_prop.npy'))*N
+
+	# Returns all data
+	return N, q, indptr, indices, group, n, c
@@ -0,0 +1,254 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+
+
+def sbm_csr(nb_vector, prob_matrix, seed = None, n_jobs = 1):
+	"""
+	Draws a random graph from the stochastic block model given the number of nodes in each group and its edge probability
+	matrix, with the same semantics as the Graph classes: the nodes are randomly permutated, and for each pair of groups
+	the possible edges are coded and the ones to build are found by drawing the geometric number of edges to skip.
+	The skips are drawn in batches and the codes decoded to nodes with array operations.
+	Returns the CSR arrays (indptr, indices) of the graph (0-indexed nodes, with sorted neighbors), the group of each node
+	(from 1 to q) and the actual proportion of edges to all possible edges between groups.
+	If seed (an int, a np.random.SeedSequence or a np.random.Generator) is given, the permutation and every pair of
+	groups draw from their own independent stream spawned from it, and the pairs of groups can be drawn on n_jobs
+	processes (all CPUs but -n_jobs - 1 if n_jobs < 0): the same seed gives the same graph whatever n_jobs is. Otherwise
+	the global NumPy random state is used.
+	Time: O(N + |E|)		Space: O(N + |E|)
+	"""
+	nb_vector = np.asarray(nb_vector, dtype = np.int64)
+	# Total number of nodes on the graph
+	N = int(np.sum(nb_vector))
+	# Total number of groups
+	q = len(nb_vector)
+	# The first node key of each group, and the biggest one plus one
+	first_nodes = np.concatenate(([0], np.cumsum(nb_vector)))
+
+	# The pairs of groups (g1, g2), g1 <= g2
+	pairs = [(g1, g2) for g1 in range(q) for g2 in range(g1, q)]
+	# The random streams of the permutation and of each pair of groups
+	streams = __streams(seed, n_jobs, len(pairs) + 1)
+
+	# Permutates the nodes so that there isn't an obvious relation between the nodes of each group
+	dic = np.arange(N)
+	streams[0].shuffle(dic)
+	# Map from each node number to its group
+	group = np.zeros(N, dtype = np.int8)
+	group[dic] = np.repeat(np.arange(1, q + 1), nb_vector)
+
+	# The edges of every pair of groups, as the keys of their ending nodes inside their groups
+	tasks = [(nb_vector[g1], nb_vector[g2], g1 == g2, prob_matrix[g1][g2], stream) for (g1, g2), stream in zip(pairs, streams[1:])]
+	# A negative number of jobs counts back from the number of CPUs (-1 for all of them)
+	if n_jobs == 0:
+		raise Exception("The number of jobs cannot be 0!")
+	if n_jobs < 0:
+		n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+	if n_jobs == 1:
+		blocks = [__build_block(*task) for task in tasks]
+	else:
+		with Pool(min(n_jobs, len(tasks))) as pool:
+			blocks = pool.starmap(__build_block, tasks)
+
+	# The edges of the graph and the actual proportion of edges between groups
+	tails = []
+	heads = []
+	edge_prop = np.zeros((q, q))
+	for (g1, g2), (a, b, prop) in zip(pairs, blocks):
+		tails.append(dic[first_nodes[g1] + a])
+		heads.append(dic[first_nodes[g2] + b])
+		edge_prop[g1][g2] = edge_prop[g2][g1] = prop
+
+	# Both directions of each (undirected) edge, sorted by tail and then by head
+	tails, heads = np.concatenate(tails + heads), np.concatenate(heads + tails)
+	order = np.lexsort((heads, tails))
+	indices = heads[order]
+	indptr = np.zeros(N + 1, dtype = np.int64)
+	np.cumsum(np.bincount(tails, minlength = N), out = indptr[1:])
+
+	return indptr, indices, group, edge_prop
+
+
+def sbm_stream(nb_vector, prob_matrix, directory, seed = None, chunk_size = 10**7):
+	"""
+	Draws a random graph from the stochastic block model as sbm_csr does, streaming its edges to disk so that no array of
+	the size of the edges is ever held in memory: the edges are drawn in batches of at most chunk_size and appended to
+	temporary files by range of tail nodes (buckets of about chunk_size edges), and each bucket is then sorted and
+	written to its place in the CSR arrays (an external bucket sort). A bucket's file is only open while a batch is
+	appended to it, so that any number of buckets can be used.
+	Writes the arrays indptr, indices (0-indexed nodes, with sorted neighbors), group and edge_prop as .npy files of the
+	directory, to be memory-mapped by read_stream, and returns the number of nodes and of directed edges.
+	Time: O(N + |E|)		Space: O(N + chunk_size) in memory, O(N + |E|) on disk
+	"""
+	nb_vector = np.asarray(nb_vector, dtype = np.int64)
+	# Total number of nodes on the graph
+	N = int(np.sum(nb_vector))
+	# Total number of groups
+	q = len(nb_vector)
+	# The first node key of each group, and the biggest one plus one
+	first_nodes = np.concatenate(([0], np.cumsum(nb_vector)))
+	os.makedirs(directory, exist_ok = True)
+
+	# The pairs of groups (g1, g2), g1 <= g2, their numbers of possible edges and the random streams of the permutation
+	# and of each pair of groups
+	pairs = [(g1, g2) for g1 in range(q) for g2 in range(g1, q)]
+	nb_pairs = [(nb_vector[g1]*(nb_vector[g1] - 1))//2 if g1 == g2 else nb_vector[g1]*nb_vector[g2] for g1, g2 in pairs]
+	streams = __streams(seed, 1, len(pairs) + 1)
+
+	# Permutates the nodes so that there isn't an obvious relation between the nodes of each group
+	dic = np.arange(N)
+	streams[0].shuffle(dic)
+	# Map from each node number to its group
+	group = np.zeros(N, dtype = np.int8)
+	group[dic] = np.repeat(np.arange(1, q + 1), nb_vector)
+	np.save(os.path.join(directory, 'group.npy'), group)
+
+	# The buckets of tail nodes, each one holding about chunk_size directed edges
+	expected = 2*sum(nb*prob_matrix[g1][g2] for (g1, g2), nb in zip(pairs, nb_pairs))
+	nb_buckets = max(1, min(N, int(np.ceil(1.25*expected/chunk_size))))
+	width = max(1, -(-N//nb_buckets))
+	# Rounding the width up may leave the last buckets empty (starting past N), so they are dropped
+	nb_buckets = -(-N//width)
+	paths = [os.path.join(directory, 'bucket' + str(k) + '.tmp') for k in range(nb_buckets)]
+	for path in paths:
+		open(path, 'wb').close()
+
+	# Streams the edges of every pair of groups to the buckets of their tails
+	M = 0
+	edge_prop = np.zeros((q, q))
+	for (g1, g2), nb, stream in zip(pairs, nb_pairs, streams[1:]):
+		p = prob_matrix[g1][g2]
+		count = 0
+		for codes in __code_batches(nb, p, stream, chunk_size):
+			# Decoding the edge codes to the keys of their ending nodes
+			if g1 == g2:
+				a, b = __decode_triangle(codes, nb_vector[g1])
+			else:
+				a, b = codes//nb_vector[g2], codes%nb_vector[g2]
+			u = dic[first_nodes[g1] + a]
+			v = dic[first_nodes[g2] + b]
+
+			# Both directions of each edge, grouped by bucket
+			edges = np.stack((np.concatenate((u, v)), np.concatenate((v, u))), axis = 1)
+			buckets = edges[:, 0]//width
+			order = np.argsort(buckets, kind = 'stable')
+			bounds = np.searchsorted(buckets[order], np.arange(nb_buckets + 1))
+			for k in np.nonzero(np.diff(bounds))[0]:
+				with open(paths[k], 'ab') as f:
+					edges[order[bounds[k]: bounds[k + 1]]].tofile(f)
+			count += len(codes)
+
+		# Computes the actual edge proportion matrix
+		if nb > 0:
+			edge_prop[g1][g2] = edge_prop[g2][g1] = count/nb
+		elif p == 1:
+			edge_prop[g1][g2] = edge_prop[g2][g1] = 1
+		M += 2*count
+	np.save(os.path.join(directory, 'edge_prop.npy'), edge_prop)
+
+	# Sorts each bucket by tail and then by head, and writes it to its place in the CSR arrays
+	indptr = np.lib.format.open_memmap(os.path.join(directory, 'indptr.npy'), mode = 'w+', dtype = np.int64, shape = (N + 1,))
+	indices = np.lib.format.open_memmap(os.path.join(directory, 'indices.npy'), mode = 'w+', dtype = np.int32 if N < 2**31 else np.int64, shape = (M,))
+	indptr[0] = 0
+	offset = 0
+	for k in range(nb_buckets):
+		edges = np.fromfile(paths[k], dtype = np.int64).reshape(-1, 2)
+		os.remove(paths[k])
+
+		start, end = k*width, min((k + 1)*width, N)
+		order = np.lexsort((edges[:, 1], edges[:, 0]))
+		indices[offset: offset + len(edges)] = edges[order, 1]
+		indptr[start + 1: end + 1] = offset + np.cumsum(np.bincount(edges[:, 0] - start, minlength = end - start))
+		offset += len(edges)
+	indptr.flush()
+	indices.flush()
+
+	return N, M
+
+
+def __streams(seed, n_jobs, count):
+	"""
+	Returns count independent random streams spawned from seed, or the global NumPy random state count times if there
+	is no seed and a single process
+	"""
+	if seed is None and n_jobs == 1:
+		return [np.random]*count
+	if isinstance(seed, np.random.Generator):
+		return seed.spawn(count)
+	sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+	return [np.random.default_rng(child) for child in sequence.spawn(count)]
+
+
+def __build_block(n1, n2, same_group, p, stream):
+	"""
+	For each node1 of a group of n1 nodes and node2 of a group of n2 nodes (the same group if same_group is True), an
+	(undirected) edge is built between node1 and node2 with probability p, drawing from stream.
+	Returns the keys of the ending nodes of the edges inside their groups and the actual proportion of edges built.
+	"""
+	# Number of possible edges between the groups
+	nb_pairs = (n1*(n1 - 1))//2 if same_group else n1*n2
+
+	# The codes (from 0 to nb_pairs - 1) of the edges to build
+	codes = np.concatenate([np.zeros(0, dtype = np.int64)] + list(__code_batches(nb_pairs, p, stream)))
+
+	# Decoding the edge codes to the keys of their ending nodes
+	if same_group:
+		a, b = __decode_triangle(codes, n1)
+	else:
+		a, b = codes//n2, codes%n2
+
+	# The actual edge proportion
+	if nb_pairs > 0:
+		prop = len(codes)/nb_pairs
+	else:
+		prop = 1.0 if p == 1 else 0.0
+	return a, b, prop
+
+
+def __code_batches(nb_pairs, p, stream, max_batch = None):
+	"""
+	Yields the sorted codes (from 0 to nb_pairs - 1) of the edges built, each one with probability p, by drawing the
+	geometric number of edges skipped between consecutive edges in batches (of at most max_batch draws) from stream
+	"""
+	# If there cannot be any edges
+	if p == 0 or nb_pairs == 0:
+		return
+	# If all edges must be built
+	if p == 1:
+		step = nb_pairs if max_batch is None else max_batch
+		for start in range(0, nb_pairs, step):
+			yield np.arange(start, min(start + step, nb_pairs), dtype = np.int64)
+		return
+
+	log_q = np.log1p(-p)
+	# The code of the last edge built
+	last = -1
+	while True:
+		# A batch a bit bigger than the expected number of edges left
+		expected = (nb_pairs - 1 - last)*p
+		size = int(expected + 5*np.sqrt(expected) + 16)
+		if max_batch is not None:
+			size = min(size, max_batch)
+		# Number of edges to skip before each edge (capped so that the sums cannot overflow)
+		skips = np.minimum(np.floor(np.log1p(-stream.random(size))/log_q), nb_pairs)
+		codes = last + np.cumsum(skips.astype(np.int64) + 1)
+
+		# If all edges have already been decided
+		if codes[-1] >= nb_pairs:
+			yield codes[codes < nb_pairs]
+			return
+		yield codes
+		last = codes[-1]
+
+
+def __decode_triangle(codes, n):
+	"""
+	Decodes the codes of the pairs (a, b), a < b, of n nodes (numbered row by row, from 0 to n*(n - 1)/2 - 1) to a and b
+	"""
+	# Row a starts at code a*n - a*(a + 1)/2, which gives a by the quadratic formula (corrected for rounding errors)
+	a = np.floor(((2*n - 1) - np.sqrt((2.0*n - 1)**2 - 8.0*codes))/2).astype(np.int64)
+	a = np.clip(a, 0, max(n - 2, 0))
+	a[codes < a*n - (a*(a + 1))//2] -= 1
+	a[codes >= (a + 1)*n - ((a + 1)*(a + 2))//2] += 1
+	start = a*n - (a*(a + 1))//2
+	return a, codes - start + a + 1
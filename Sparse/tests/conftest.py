@@ -0,0 +1,25 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The modules of this directory import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sbm_csr import sbm_csr
+
+
+@pytest.fixture
+def sbm_edges():
+	"""
+	Draws a graph of the stochastic block model from the number of nodes of each group, the edge probabilities inside and
+	between groups and a seed, and returns its number of nodes and the rows and columns of the nonzero elements of its
+	adjacency matrix (as the Sparse functions take them)
+	"""
+	def draw(nb_vector = (100, 100), p_in = .05, p_out = .01, seed = 4):
+		q = len(nb_vector)
+		prob_matrix = np.full((q, q), p_out) + (p_in - p_out)*np.eye(q)
+		indptr, indices, group, edge_prop = sbm_csr(np.array(nb_vector), prob_matrix, seed = seed)
+		N = len(group)
+		return N, np.repeat(np.arange(N), np.diff(indptr)), indices
+	return draw
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import eigensolver
+from operator_cache import OperatorCache
+from Bethe_Hessian import eigenvectors
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_cached_eigenpairs_are_kept_for_each_solver(tmp_path, monkeypatch, sbm_edges):
+	# LOBPCG stops after a single iteration, far from the eigenvectors, which must not be returned to the dense solver
+	N, row, col = sbm_edges(p_in = .06, seed = 8)
+	expected = eigenvectors(N, row, col, 2, solver = 'dense')
+	cache = OperatorCache(str(tmp_path))
+	monkeypatch.setattr(eigensolver, 'LOBPCG_MAXITER', 1)
+	eigenvectors(N, row, col, 2, cache, solver = 'lobpcg')
+	result = eigenvectors(N, row, col, 2, cache, solver = 'dense')
+	assert np.allclose(result, expected)
+
+
+@pytest.mark.parametrize('nb_vector, p_in, p_out', [((100, 100), .05, .01), ((100, 100), .01, .06), ((60, 60, 60), .1, .01)])
+def test_inertia_matches_eigensolve(sbm_edges, nb_vector, p_in, p_out):
+	# Assortative groups (negative eigenvalues of H(sqrt(c))) and disassortative ones (of H(-sqrt(c)))
+	N, row, col = sbm_edges(nb_vector, p_in, p_out)
+	expected = eigenvectors(N, row, col, 6)
+	result = eigenvectors(N, row, col, 6, inertia = True)
+	assert result.shape == expected.shape == (N, len(nb_vector))
+	# The same unit eigenvectors, up to sign
+	assert np.allclose(np.abs(np.sum(result*expected, axis = 0)), 1)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import eigensolver
+from scipy.sparse import csr_matrix
+from Bethe_Hessian import adjacency, Bethe_Hessian, Bethe_Hessian_operator
+from eigensolver import smallest_eigenpairs, negative_count
+
+
+def matching_edges():
+	# A perfect matching: c_avg = 1 and H(1) = D - A is singular
+	tails = np.arange(20)
+	return 20, tails, tails ^ 1
+
+
+@pytest.mark.parametrize('matching', [False, True])
+@pytest.mark.parametrize('r', [1, 1.5, 2.5, -2.5])
+@pytest.mark.parametrize('dense', [False, True])
+def test_negative_count_matches_eigenvalues(sbm_edges, matching, r, dense):
+	N, row, col = matching_edges() if matching else sbm_edges()
+	hessian = Bethe_Hessian(N, row, col, r)
+	eig_val = np.linalg.eigvalsh(hessian.toarray())
+	assert negative_count(hessian.toarray() if dense else csr_matrix(hessian)) == np.sum(eig_val < -1e-8)
+
+
+@pytest.mark.parametrize('solver', ['auto', 'dense', 'arpack', 'shift_invert', 'lobpcg'])
+def test_solvers_match_eigh(sbm_edges, solver):
+	# The two negative eigenvalues of H(sqrt(c_avg)) on an SBM graph with two groups
+	N, row, col = sbm_edges()
+	r = np.sqrt(len(row)/N)
+	hessian = Bethe_Hessian(N, row, col, r)
+	eig_val, eig_vec = np.linalg.eigh(hessian.toarray())
+	eig_vec *= np.sign(eig_vec[np.argmax(np.abs(eig_vec), axis = 0), np.arange(N)])
+
+	result_val, result_vec = smallest_eigenpairs(hessian, 2, solver, tol = 1e-8 if solver == 'lobpcg' else None)
+	assert np.allclose(result_val, eig_val[: 2], atol = 1e-6)
+	assert np.allclose(result_vec, eig_vec[:, : 2], atol = 1e-4)
+
+	if solver != 'shift_invert':
+		# The matrix-free operator gives the same eigenpairs
+		adj_matrix, degrees = adjacency(N, row, col)
+		operator_val, operator_vec = smallest_eigenpairs(Bethe_Hessian_operator(adj_matrix, degrees, r), 2, solver, tol = 1e-8 if solver == 'lobpcg' else None)
+		assert np.allclose(operator_val, result_val, atol = 1e-6)
+		assert np.allclose(operator_vec, result_vec, atol = 1e-4)
+
+
+@pytest.mark.parametrize('solver', ['arpack', 'lobpcg'])
+def test_warm_start_gives_the_same_eigenpairs(sbm_edges, solver):
+	# Starting from the eigenvectors of a nearby regularizer, as the sweeps over r do
+	N, row, col = sbm_edges()
+	r = np.sqrt(len(row)/N)
+	tol = 1e-8 if solver == 'lobpcg' else None
+	_, start = smallest_eigenpairs(Bethe_Hessian(N, row, col, 1.05*r), 2, 'dense')
+	expected = smallest_eigenpairs(Bethe_Hessian(N, row, col, r), 2, solver, tol = tol)
+	result = smallest_eigenpairs(Bethe_Hessian(N, row, col, r), 2, solver, tol = tol, start = start)
+	assert np.allclose(result[0], expected[0], atol = 1e-6)
+	assert np.allclose(result[1], expected[1], atol = 1e-4)
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+@pytest.mark.parametrize('maxiter', [1, eigensolver.LOBPCG_MAXITER])
+def test_unconverged_lobpcg_falls_back_to_arpack(sbm_edges, monkeypatch, maxiter):
+	N, row, col = sbm_edges()
+	hessian = Bethe_Hessian(N, row, col, np.sqrt(len(row)/N))
+	expected = smallest_eigenpairs(hessian, 2, 'dense')
+	# ARPACK is only run when LOBPCG stops after a single iteration, far from the eigenvectors
+	arpack_calls = []
+	eigsh = eigensolver.linalg.eigsh
+	monkeypatch.setattr(eigensolver.linalg, 'eigsh', lambda *args, **kwargs: arpack_calls.append(1) or eigsh(*args, **kwargs))
+	monkeypatch.setattr(eigensolver, 'LOBPCG_MAXITER', maxiter)
+	result = smallest_eigenpairs(hessian, 2, 'lobpcg', tol = 1e-8)
+	assert len(arpack_calls) == (maxiter == 1)
+	assert np.allclose(result[0], expected[0], atol = 1e-6)
+	assert np.allclose(result[1], expected[1], atol = 1e-4)
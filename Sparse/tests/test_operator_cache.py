@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from scipy.sparse import random as sparse_random
+from operator_cache import OperatorCache
+from Bethe_Hessian import eigenvectors
+
+
+def test_key_depends_on_contents_types_and_shapes():
+	a = np.arange(6)
+	assert OperatorCache.key(a) == OperatorCache.key(np.arange(6))
+	assert OperatorCache.key(a) != OperatorCache.key(a.astype(np.int32))
+	assert OperatorCache.key(a) != OperatorCache.key(a.reshape(2, 3))
+	assert OperatorCache.key(a) != OperatorCache.key(a[::-1])
+	assert OperatorCache.key(a, a) != OperatorCache.key(a)
+
+
+def test_entries_are_read_back(tmp_path):
+	cache = OperatorCache(str(tmp_path))
+	key = OperatorCache.key(np.arange(3))
+	matrix = sparse_random(20, 20, density = .2, format = 'csr', random_state = 0)
+	cache.save(key, 'vectors', {'values': np.arange(4.), 'vectors': np.eye(4)})
+	cache.save_sparse(key, 'matrix', matrix)
+
+	arrays = cache.load(key, 'vectors')
+	assert np.array_equal(arrays['values'], np.arange(4.)) and np.array_equal(arrays['vectors'], np.eye(4))
+	assert (cache.load_sparse(key, 'matrix') != matrix).nnz == 0
+	assert cache.load(key, 'other') is None and cache.load_sparse('other', 'matrix') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+	# Room for two entries of 1000 floats
+	cache = OperatorCache(str(tmp_path), max_bytes = 17000)
+	for name in ('a', 'b'):
+		cache.save('key', name, {'x': np.zeros(1000)})
+	# a is older than b, but is then read
+	os.utime(os.path.join(str(tmp_path), 'key', 'a'), (1, 1))
+	os.utime(os.path.join(str(tmp_path), 'key', 'b'), (2, 2))
+	cache.load('key', 'a')
+	cache.save('key', 'c', {'x': np.zeros(1000)})
+
+	assert cache.load('key', 'b') is None
+	assert cache.load('key', 'a') is not None and cache.load('key', 'c') is not None
+
+
+def test_cached_eigenvectors_match(tmp_path, sbm_edges):
+	# The second call reads the Bethe-Hessian matrices and eigenpairs from the cache
+	N, row, col = sbm_edges(p_in = .06, seed = 8)
+	expected = eigenvectors(N, row, col, 3)
+	cache = OperatorCache(str(tmp_path))
+	assert np.allclose(eigenvectors(N, row, col, 3, cache), expected)
+	assert np.allclose(eigenvectors(N, row, col, 3, cache), expected)
+	assert len(os.listdir(str(tmp_path))) == 1
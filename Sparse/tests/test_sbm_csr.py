@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from sbm_csr import sbm_csr, sbm_stream
+from read_sparse import read_stream
+
+
+NB_VECTOR = np.array([50, 50])
+PROB_MATRIX = np.array([[.5, .1], [.1, .5]])
+
+
+@pytest.mark.parametrize('chunk_size', [7, 40, 1000, 10**7])
+def test_stream_matches_csr(tmp_path, chunk_size):
+	# Small chunks give more buckets than sqrt(N), whose widths are rounded up
+	indptr, indices, group, edge_prop = sbm_csr(NB_VECTOR, PROB_MATRIX, seed = 1)
+	N, M = sbm_stream(NB_VECTOR, PROB_MATRIX, str(tmp_path), seed = 1, chunk_size = chunk_size)
+	_, _, stream_indptr, stream_indices, stream_group, _, _ = read_stream(str(tmp_path))
+
+	assert (N, M) == (100, indptr[-1])
+	assert np.array_equal(stream_indptr, indptr)
+	assert np.array_equal(stream_indices, indices)
+	assert np.array_equal(stream_group, group)
+
+
+def test_csr_is_symmetric_and_sorted():
+	indptr, indices, group, edge_prop = sbm_csr(NB_VECTOR, PROB_MATRIX, seed = 2, n_jobs = 1)
+	tails = np.repeat(np.arange(100), np.diff(indptr))
+	edges = set(zip(tails.tolist(), indices.tolist()))
+
+	assert all((v, u) in edges for u, v in edges)
+	assert not np.any(tails == indices)
+	assert all(np.all(np.diff(indices[indptr[u]: indptr[u + 1]]) > 0) for u in range(100))
+	assert np.allclose(edge_prop, edge_prop.T)
+
+
+def test_csr_does_not_depend_on_jobs():
+	single = sbm_csr(NB_VECTOR, PROB_MATRIX, seed = 3, n_jobs = 1)
+	pooled = sbm_csr(NB_VECTOR, PROB_MATRIX, seed = 3, n_jobs = 2)
+	assert all(np.array_equal(a, b) for a, b in zip(single, pooled))
+
+
+def block_counts(indptr, indices, group):
+	# The number of (undirected) edges between each pair of groups
+	tails = np.repeat(np.arange(len(group)), np.diff(indptr))
+	counts = np.zeros((2, 2))
+	np.add.at(counts, (group[tails] - 1, group[indices] - 1), 1)
+	return counts/(1 + np.eye(2))
+
+
+def test_csr_block_densities():
+	# The edges of each pair of groups follow its probability, and edge_prop is their actual proportion
+	nb_vector, prob_matrix = np.array([300, 200]), np.array([[.05, .01], [.01, .08]])
+	indptr, indices, group, edge_prop = sbm_csr(nb_vector, prob_matrix, seed = 4)
+	possible = np.outer(nb_vector, nb_vector) - np.diag(nb_vector*(nb_vector + 1)//2)
+	counts = block_counts(indptr, indices, group)
+
+	assert np.array_equal(np.bincount(group)[1:], nb_vector)
+	assert np.allclose(edge_prop, counts/possible)
+	assert np.all(np.abs(counts - prob_matrix*possible) < 5*np.sqrt(prob_matrix*(1 - prob_matrix)*possible))
+
+
+def test_csr_extreme_probabilities():
+	# Each group is a clique, and there is no edge between groups
+	indptr, indices, group, edge_prop = sbm_csr(np.array([5, 7]), np.array([[1, 0], [0, 1]]), seed = 5)
+	assert np.array_equal(block_counts(indptr, indices, group), np.diag([10, 21]))
+	assert np.array_equal(edge_prop, np.eye(2))
+
+
+def test_stream_buckets_do_not_stay_open(tmp_path):
+	# About 2000 buckets, many more than the open files allowed, which were all kept open while the edges were drawn
+	resource = pytest.importorskip('resource')
+	nb_vector, prob_matrix = np.array([1000, 1000]), np.array([[.006, .002], [.002, .006]])
+	indptr, indices, group, edge_prop = sbm_csr(nb_vector, prob_matrix, seed = 2)
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, hard), hard))
+	try:
+		sbm_stream(nb_vector, prob_matrix, str(tmp_path), seed = 2, chunk_size = 10)
+	finally:
+		resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+	_, _, stream_indptr, stream_indices, _, _, _ = read_stream(str(tmp_path))
+	assert np.array_equal(stream_indptr, indptr)
+	assert np.array_equal(stream_indices, indices)